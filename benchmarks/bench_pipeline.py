@@ -0,0 +1,187 @@
+# -- coding: utf-8 --
+"""
+Load test of the whole report pipeline against the local mock servers: login,
+page fetch, __VIEWSTATE parse, payload build, submit and mail send. Per-stage
+latency and accounts per minute are written as json.
+
+    python benchmarks/bench_pipeline.py --sizes 10,100,1000 --workers 8 --output bench.json
+    python benchmarks/bench_pipeline.py --sizes 1000 --transport aiohttp --max_in_flight 200
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+import subprocess
+
+import yaml
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from email.message import EmailMessage
+from selfreport.SelfReport import SelfReport
+from selfreport.StageTimer import StageTimer
+from selfreport.MockServer import MockServer
+from selfreport.MockSmtpServer import MockSmtpServer
+
+
+def write_configs(work_dir, size, server, smtp_server, args):
+    """
+    Write setting_config.yaml and person_config.yaml pointing to the mock servers.
+    :param work_dir: directory to write to
+    :param size: number of accounts
+    :param server: MockServer
+    :param smtp_server: MockSmtpServer
+    :param args: command line arguments
+    :return: (path of setting_config.yaml, path of person_config.yaml)
+    """
+    with open(os.path.join(ROOT_DIR, 'configs', 'setting_config.yaml'), encoding='utf8') as f:
+        setting_config = yaml.load(f, Loader=yaml.FullLoader)
+
+    setting_config['server'] = {'selfreport_url': server.url, 'newsso_url': server.url}
+    setting_config['concurrency'] = {'workers': args.workers, 'rate_limit': {}}
+    setting_config['transport'] = {'backend': args.transport, 'max_in_flight': args.max_in_flight}
+    setting_config['session_cache'] = {'enable': args.session_cache,
+                                       'path': os.path.join(work_dir, 'session_cache.json'),
+                                       'max_age': 3600}
+    setting_config['scheduler']['state_path'] = os.path.join(work_dir, 'scheduler.json')
+    setting_config['job_store']['path'] = os.path.join(work_dir, 'jobs.sqlite3')
+    setting_config['email'].update({'from': 'bench@localhost', 'username': 'bench', 'password': 'bench',
+                                    'smtp': '127.0.0.1', 'port': smtp_server.server_address[1], 'ssl': False,
+                                    'connections': args.mail_connections})
+
+    person_config = [{
+        'id': "{:08d}".format(i),
+        'pwd': 'pwd',
+        'email_to': "{:08d}@localhost".format(i),
+        'campus': '宝山',
+        'county': '宝山区',
+        'address': '上海市宝山区上大路99号'
+    } for i in range(size)]
+
+    setting_config_path = os.path.join(work_dir, 'setting_config.yaml')
+    person_config_path = os.path.join(work_dir, 'person_config.yaml')
+    with open(setting_config_path, 'w', encoding='utf8') as f:
+        yaml.safe_dump(setting_config, f, allow_unicode=True)
+    with open(person_config_path, 'w', encoding='utf8') as f:
+        yaml.safe_dump(person_config, f, allow_unicode=True)
+    return setting_config_path, person_config_path
+
+
+def run(size, server, smtp_server, args):
+    """
+    Report "size" accounts through test_all_accounts and send one mail each.
+    :param size: number of accounts
+    :param server: MockServer
+    :param smtp_server: MockSmtpServer
+    :param args: command line arguments
+    :return: dict of results
+    """
+    work_dir = tempfile.mkdtemp(prefix='bench_')
+    try:
+        setting_config_path, person_config_path = write_configs(work_dir, size, server, smtp_server, args)
+        stage_timer = StageTimer()
+        self_report = SelfReport(setting_config_path, person_config_path, os.path.join(work_dir, 'log'),
+                                 "bench{}".format(size), benchmark=True, stage_timer=stage_timer)
+
+        output = []
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(_Collector(output)):
+            try:
+                self_report.test_all_accounts()
+            except SystemExit:
+                pass
+        report_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(size):
+            msg = EmailMessage()
+            msg['Subject'] = 'bench'
+            msg['From'] = 'bench@localhost'
+            msg['To'] = "{:08d}@localhost".format(i)
+            msg.set_content('bench')
+            self_report.mail_dispatcher.send(msg, msg['To'], self_report.setting_config.email)
+        self_report.mail_dispatcher.join()
+        mail_seconds = time.perf_counter() - start
+
+        succeeded = sum(1 for line in output if line.endswith('成功'))
+        return {
+            'accounts': size,
+            'workers': args.workers,
+            'transport': args.transport,
+            'succeeded': succeeded,
+            'report_seconds': report_seconds,
+            'accounts_per_minute': size / report_seconds * 60,
+            'mail_seconds': mail_seconds,
+            'mails_per_minute': size / mail_seconds * 60,
+            'stages': stage_timer.summary()
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class _Collector(object):
+    def __init__(self, lines):
+        self.lines = lines
+
+    def write(self, text):
+        self.lines.extend(line for line in text.splitlines() if line)
+
+    def flush(self):
+        pass
+
+
+def get_version():
+    """
+    Get the git revision of the code being measured.
+    :return: revision, None if unknown
+    """
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=str, default='10,100,1000', help='账号数，用逗号分隔，如10,100,1000,10000')
+    parser.add_argument('--workers', type=int, default=8, help='同时报送的账号数')
+    parser.add_argument('--transport', type=str, default='requests', choices=('requests', 'aiohttp'),
+                        help='报送使用的HTTP客户端')
+    parser.add_argument('--max_in_flight', type=int, default=200, help='aiohttp下同时报送的账号数')
+    parser.add_argument('--mail_connections', type=int, default=1, help='smtp连接数')
+    parser.add_argument('--session_cache', action='store_true', help='开启登录状态缓存')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟服务器每个请求的平均延迟（秒）')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='模拟服务器返回500错误的概率')
+    parser.add_argument('--output', '-o', type=str, default='bench_output.json', help='结果保存路径')
+    args = parser.parse_args()
+
+    server = MockServer(('127.0.0.1', 0), latency=args.latency, error_rate=args.error_rate)
+    smtp_server = MockSmtpServer(('127.0.0.1', 0))
+    for s in (server, smtp_server):
+        threading.Thread(target=s.serve_forever, daemon=True).start()
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        result = run(size, server, smtp_server, args)
+        results.append(result)
+        print("{:>6} accounts  {:>8.1f} accounts/min  {:>8.1f} mails/min  {}/{} succeeded".format(
+            size, result['accounts_per_minute'], result['mails_per_minute'], result['succeeded'], size))
+        for name, stage in sorted(result['stages'].items()):
+            print("    {:<8} mean {:>8.2f} ms  p95 {:>8.2f} ms".format(name, stage['mean'] * 1e3, stage['p95'] * 1e3))
+
+    with open(args.output, 'w', encoding='utf8') as f:
+        json.dump({
+            'version': get_version(),
+            'python': platform.python_version(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'parameters': vars(args),
+            'results': results
+        }, f, ensure_ascii=False, indent=2)
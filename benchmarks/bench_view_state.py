@@ -0,0 +1,52 @@
+# -- coding: utf-8 --
+"""
+Micro-benchmark of the ways to extract "__VIEWSTATE" from the saved pages in
+benchmarks/fixtures.
+
+    python benchmarks/bench_view_state.py [--number 200]
+"""
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selfreport.ViewStateExtractor import ViewStateExtractor
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIXTURES = ['HalfdayReport.html', 'Login.html']
+
+
+def bench(number):
+    """
+    Time every extractor on every fixture page.
+    :param number: times to extract from each page
+    :return: no return
+    """
+    methods = {
+        'soup': ViewStateExtractor.extract_soup,
+        'regex': ViewStateExtractor.extract_regex,
+        'extract': ViewStateExtractor('regex').extract
+    }
+
+    for fixture in FIXTURES:
+        with open(os.path.join(FIXTURE_DIR, fixture), encoding='utf8') as f:
+            text = f.read()
+
+        expected = ViewStateExtractor.extract_soup(text)
+        results = {}
+        for name, method in methods.items():
+            assert method(text) == expected, "{} disagrees with soup on {}".format(name, fixture)
+            results[name] = timeit.timeit(lambda: method(text), number=number) / number
+
+        print("{} ({} KB)".format(fixture, len(text) // 1024))
+        for name, seconds in results.items():
+            print("  {:<8} {:>10.1f} us  x{:.0f}".format(name, seconds * 1e6, results['soup'] / seconds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', '-n', type=int, default=200, help='每个页面解析的次数')
+    args = parser.parse_args()
+    bench(args.number)
@@ -2,14 +2,28 @@
 import argparse
 
 from selfreport.SelfReport import SelfReport
+from selfreport.Cassette import Cassette
+
+
+def parse_shard(value):
+    """
+    Parse the argument of --shard.
+    :param value: "i/N", the shard i of N shards, i from 0 to N-1
+    :return: (i, N)
+    """
+    try:
+        index, count = (int(x) for x in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("{} is not in the form i/N".format(value))
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError("{} is not a shard of 0/N to N-1/N".format(value))
+    return index, count
 
 if __name__ == "__main__":
     setting_config_path = "configs/setting_config.yaml"
     person_config_path = "configs/person_config.yaml"
     save_log_dir = "log/"
 
-    self_report = SelfReport(setting_config_path, person_config_path, save_log_dir, "selfreport")
-
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '--test_all_accounts',
@@ -21,23 +35,58 @@ if __name__ == "__main__":
         '-s',
         type=str,
         help='测试单个账号')
+    parser.add_argument(
+        '--validate_accounts',
+        '-v',
+        type=str,
+        help='并发验证所有账号能否登录（不报送），后接报告保存路径，以.csv结尾保存为csv，否则保存为json')
     parser.add_argument(
         '--test_send_email',
         '-e',
         type=str,
         help='测试邮件发送模块，后接测试测试邮件收件邮箱')
+    parser.add_argument(
+        '--benchmark',
+        '-b',
+        action='store_true',
+        help='性能测试模式，测试账号时不在账号之间随机等待')
+    parser.add_argument(
+        '--shard',
+        type=parse_shard,
+        help='分片运行，后接i/N，只报送按账号哈希分成N片后的第i片（0到N-1）')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument(
+        '--record',
+        type=str,
+        help='录制模式，后接目录，将每个账号的请求与响应保存到该目录')
+    cassette_group.add_argument(
+        '--replay',
+        type=str,
+        help='回放模式，后接录制的目录，不访问网络，按录制的响应报送，用于性能分析')
     args = parser.parse_args()
 
+    cassette = None
+    if args.record:
+        cassette = Cassette(Cassette.RECORD, args.record)
+    elif args.replay:
+        cassette = Cassette(Cassette.REPLAY, args.replay)
+
+    self_report = SelfReport(setting_config_path, person_config_path, save_log_dir, "selfreport", args.benchmark,
+                             shard=args.shard, cassette=cassette)
+
     if args.test_all_accounts:
         self_report.test_all_accounts()
 
     if args.test_single_account:
         self_report.test_single_account(args.test_single_account)
 
+    if args.validate_accounts:
+        print(self_report.validate_accounts(args.validate_accounts).render())
+
     if args.test_send_email:
         self_report.test_send_email(args.test_send_email)
 
-    if args.test_all_accounts or args.test_single_account or args.test_send_email:
+    if args.test_all_accounts or args.test_single_account or args.validate_accounts or args.test_send_email:
         exit(0)
 
     self_report.auto_report()
@@ -0,0 +1,71 @@
+# -- coding: utf-8 --
+import json
+import time
+import argparse
+import threading
+
+import yaml
+
+from selfreport.MockServer import MockServer
+from selfreport.MockSmtpServer import MockSmtpServer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8000,
+        help='模拟每日两报和统一身份认证服务器的端口')
+    parser.add_argument(
+        '--smtp_port',
+        type=int,
+        default=8025,
+        help='模拟smtp服务器的端口，为0时不启动')
+    parser.add_argument(
+        '--person_config',
+        type=str,
+        help='只接受该person_config.yaml中的账号密码，不填则接受任意账号密码')
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.0,
+        help='每个请求的平均延迟（秒）')
+    parser.add_argument(
+        '--error_rate',
+        type=float,
+        default=0.0,
+        help='返回500错误的概率')
+    parser.add_argument(
+        '--drop_rate',
+        type=float,
+        default=0.0,
+        help='直接断开连接的概率')
+    parser.add_argument(
+        '--session_ttl',
+        type=int,
+        default=3600,
+        help='登录状态的有效时间（秒）')
+    args = parser.parse_args()
+
+    accounts = None
+    if args.person_config:
+        with open(args.person_config, encoding='utf8') as f:
+            accounts = {str(p['id']): str(p['pwd']) for p in yaml.load(f, Loader=yaml.FullLoader)}
+
+    server = MockServer(('127.0.0.1', args.port), accounts, args.latency, args.error_rate, args.drop_rate,
+                        args.session_ttl)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print("selfreport_url / newsso_url: {}".format(server.url))
+
+    smtp_server = None
+    if args.smtp_port:
+        smtp_server = MockSmtpServer(('127.0.0.1', args.smtp_port))
+        threading.Thread(target=smtp_server.serve_forever, daemon=True).start()
+        print("smtp: 127.0.0.1 port: {} ssl: false".format(args.smtp_port))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps({'http': server.stats, 'smtp': smtp_server.stats if smtp_server else None},
+                         ensure_ascii=False))
@@ -0,0 +1,156 @@
+# -- coding: utf-8 --
+
+import time
+import asyncio
+from urllib.parse import urlencode
+from http.cookies import SimpleCookie
+from email.utils import parsedate_to_datetime
+
+from selfreport.RetryPolicy import UnsentError
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class HTTPError(OSError):
+    def __init__(self, message, response=None):
+        """
+        Initialize the class named HTTPError, a server error raised by the async
+        transport, named like requests.HTTPError so that the same retry rules
+        apply to both transports.
+        :param message: message
+        :param response: the AsyncResponse
+        """
+        super().__init__(message)
+        self.response = response
+
+
+class AsyncResponse(object):
+    __slots__ = ('status_code', 'url', 'text')
+
+    def __init__(self, status_code, url, text):
+        """
+        Initialize the class named AsyncResponse, a response of the async
+        transport with the fields of requests.Response which "selfreport" uses.
+        :param status_code: HTTP status code
+        :param url: url of the response after redirects
+        :param text: decoded body
+        """
+        self.status_code = status_code
+        self.url = url
+        self.text = text
+
+
+class AsyncTransport(object):
+    def __init__(self, pool_size=100, timeout=30):
+        """
+        Initialize the class named AsyncTransport, an aiohttp connection pool
+        shared by all accounts, so that the connections to the servers are kept
+        alive and reused between accounts while every account keeps its own
+        cookies. Use it as an "async with" block.
+        :param pool_size: maximum number of open connections
+        :param timeout: seconds after which a request is abandoned
+        """
+        if aiohttp is None:
+            raise ImportError("the aiohttp transport requires aiohttp, install it with: pip install aiohttp")
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.connector = None
+
+    @staticmethod
+    def is_available():
+        """
+        Check whether aiohttp is installed.
+        :return: whether the aiohttp transport can be used
+        """
+        return aiohttp is not None
+
+    async def __aenter__(self):
+        self.connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.connector.close()
+        self.connector = None
+
+    def session(self):
+        """
+        Open a session with its own cookie jar on the shared connection pool.
+        :return: aiohttp.ClientSession, to be used as an "async with" block
+        """
+        return aiohttp.ClientSession(connector=self.connector, connector_owner=False, timeout=self.timeout,
+                                     cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    @staticmethod
+    async def request(sess, method, url, **kwargs):
+        """
+        Send a request and read its body. A form given as a dict is url encoded
+        like requests does. Errors of aiohttp and timeouts are raised as
+        ConnectionError, so that they are retried like the errors of requests,
+        and as UnsentError if the connection could not be made.
+        :param sess: aiohttp.ClientSession
+        :param method: HTTP method
+        :param url: url
+        :param kwargs: other arguments of aiohttp.ClientSession.request
+        :return: AsyncResponse
+        """
+        if isinstance(kwargs.get('data'), dict):
+            # aiohttp sends large forms as multipart, which the servers do not accept
+            kwargs['data'] = urlencode(kwargs['data'])
+            kwargs['headers'] = dict(kwargs.get('headers') or {},
+                                     **{'Content-Type': 'application/x-www-form-urlencoded'})
+        try:
+            async with sess.request(method, url, **kwargs) as r:
+                return AsyncResponse(r.status, str(r.url), await r.text())
+        except aiohttp.ClientConnectorError as e:
+            raise UnsentError("{} {}".format(url, e)) from e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ConnectionError("{} {}".format(url, str(e) or type(e).__name__)) from e
+
+    @staticmethod
+    def set_cookies(sess, cookies):
+        """
+        Put cookies cached by SessionCache into the cookie jar of "sess".
+        :param sess: aiohttp.ClientSession
+        :param cookies: list of dict of name, value, domain, path, expires and secure
+        :return: no return
+        """
+        morsels = SimpleCookie()
+        for c in cookies:
+            morsels[c['name']] = c['value']
+            morsels[c['name']]['domain'] = c['domain'] or ''
+            morsels[c['name']]['path'] = c['path'] or '/'
+            morsels[c['name']]['secure'] = bool(c['secure'])
+            if c['expires'] is not None:
+                morsels[c['name']]['max-age'] = str(max(0, int(c['expires'] - time.time())))
+        sess.cookie_jar.update_cookies(morsels)
+
+    @staticmethod
+    def get_cookies(sess):
+        """
+        Get the cookies of "sess" in the form cached by SessionCache.
+        :param sess: aiohttp.ClientSession
+        :return: list of dict of name, value, domain, path, expires and secure
+        """
+        cookies = []
+        for morsel in sess.cookie_jar:
+            try:
+                if morsel['max-age']:
+                    expires = int(time.time()) + int(morsel['max-age'])
+                elif morsel['expires']:
+                    expires = int(parsedate_to_datetime(morsel['expires']).timestamp())
+                else:
+                    expires = None
+            except (TypeError, ValueError):
+                expires = None
+            cookies.append({
+                'name': morsel.key,
+                'value': morsel.value,
+                'domain': morsel['domain'],
+                'path': morsel['path'] or '/',
+                'expires': expires,
+                'secure': bool(morsel['secure'])
+            })
+        return cookies
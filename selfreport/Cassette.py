@@ -0,0 +1,166 @@
+# -- coding: utf-8 --
+
+import os
+import gzip
+import json
+import contextvars
+from collections import deque
+from urllib.parse import urlsplit
+from contextlib import contextmanager
+
+from selfreport.RetryPolicy import RetryPolicy, UnsentError
+
+
+class CassetteError(Exception):
+    """
+    The requests of a replay differ from the recorded ones. It is not an
+    OSError, so it is not retried.
+    """
+
+
+class CassetteResponse(object):
+    __slots__ = ('status_code', 'url', 'text')
+
+    def __init__(self, status_code, url, text):
+        """
+        Initialize the class named CassetteResponse, a replayed response with
+        the fields of requests.Response which "selfreport" uses.
+        :param status_code: HTTP status code
+        :param url: url of the response after redirects
+        :param text: decoded body
+        """
+        self.status_code = status_code
+        self.url = url
+        self.text = text
+
+
+class Cassette(object):
+    RECORD = 'record'
+    REPLAY = 'replay'
+    MASKED_FIELDS = ('password',)
+
+    current = contextvars.ContextVar('cassette', default=None)
+
+    def __init__(self, mode, cassette_dir):
+        """
+        Initialize the class named Cassette. In record mode every request of an
+        account and its response or error is saved, in order, to a gzip
+        compressed file of json lines named after the account. In replay mode
+        the saved responses are served back instead of sending the requests.
+        :param mode: Cassette.RECORD or Cassette.REPLAY
+        :param cassette_dir: directory of the cassette files
+        """
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError("unknown cassette mode {}".format(mode))
+        self.mode = mode
+        self.cassette_dir = cassette_dir
+        if mode == self.RECORD and not os.path.exists(cassette_dir):
+            os.makedirs(cassette_dir)
+
+    @property
+    def is_replay(self):
+        return self.mode == self.REPLAY
+
+    @contextmanager
+    def use(self, account):
+        """
+        Record or replay the requests of "account" made in the "with" block,
+        in the current thread or coroutine.
+        :param account: account id
+        :return: context manager
+        """
+        exchanges = deque(self.__read(account)) if self.is_replay else []
+        token = self.current.set(exchanges)
+        try:
+            yield
+        finally:
+            self.current.reset(token)
+            if not self.is_replay:
+                self.__write(account, exchanges)
+
+    def record(self, method, url, data=None, response=None, error=None):
+        """
+        Record a request of the current account.
+        :param method: HTTP method
+        :param url: url
+        :param data: the form sent, if any, whose password is masked
+        :param response: the response, with status_code, url and text
+        :param error: the error raised instead of a response
+        :return: no return
+        """
+        exchanges = self.current.get()
+        if exchanges is None:
+            return
+        exchange = {'method': method, 'url': url}
+        if data:
+            exchange['data'] = {k: '***' if k in self.MASKED_FIELDS else
+                                v.decode('utf8', errors='replace') if isinstance(v, bytes) else v
+                                for k, v in data.items()}
+        if error is not None:
+            exchange['error'] = "{}: {}".format(type(error).__name__, error)
+            if RetryPolicy.is_unsent(error):
+                exchange['unsent'] = True
+        else:
+            exchange.update(status=response.status_code, final_url=str(response.url), text=response.text)
+        exchanges.append(exchange)
+
+    def replay(self, method, url):
+        """
+        Serve the next recorded response of the current account. The request
+        must have the same method and path as the recorded one, the query
+        string, which holds the date, may differ. Recorded network errors are
+        raised again as ConnectionError, or UnsentError if the request was not
+        sent, so that they are retried as they were.
+        :param method: HTTP method
+        :param url: url
+        :return: CassetteResponse
+        """
+        exchanges = self.current.get()
+        if not exchanges:
+            raise CassetteError("回放 无记录 {} {}".format(method, url))
+        exchange = exchanges.popleft()
+        if exchange['method'] != method or urlsplit(exchange['url']).path != urlsplit(url).path:
+            raise CassetteError("回放 不一致 {} {}，记录为 {} {}".format(method, url, exchange['method'],
+                                                                    exchange['url']))
+        if exchange.get('unsent'):
+            raise UnsentError("回放 {}".format(exchange['error']))
+        if 'error' in exchange:
+            raise ConnectionError("回放 {}".format(exchange['error']))
+        return CassetteResponse(exchange['status'], exchange['final_url'], exchange['text'])
+
+    def __get_path(self, account):
+        """
+        Get the path of the cassette of an account.
+        :param account: account id
+        :return: path
+        """
+        return os.path.join(self.cassette_dir, "{}.jsonl.gz".format(account))
+
+    def __read(self, account):
+        """
+        Read the cassette of an account.
+        :param account: account id
+        :return: list of exchanges, empty if there is no cassette
+        """
+        try:
+            with gzip.open(self.__get_path(account), 'rt', encoding='utf8') as f:
+                return [json.loads(line) for line in f]
+        except FileNotFoundError:
+            return []
+
+    def __write(self, account, exchanges):
+        """
+        Write the cassette of an account, readable only by its owner since it
+        holds personal information.
+        :param account: account id
+        :param exchanges: list of exchanges
+        :return: no return
+        """
+        path = self.__get_path(account)
+        tmp_path = path + '.tmp'
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as raw, \
+                gzip.open(raw, 'wt', encoding='utf8') as f:
+            for exchange in exchanges:
+                f.write(json.dumps(exchange, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+        os.replace(tmp_path, path)
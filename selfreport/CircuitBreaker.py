@@ -0,0 +1,123 @@
+# -- coding: utf-8 --
+
+import time
+import threading
+from collections import deque
+
+
+class CircuitBreaker(object):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window=20, failure_rate=0.5, min_requests=10, pause=60, logger=None):
+        """
+        Initialize the class named CircuitBreaker, one circuit per host. When
+        the failure rate of the latest requests to a host crosses the threshold,
+        every request to it waits for "pause" seconds, then a single request
+        probes the host and the others are released once it succeeds.
+        :param window: number of latest requests of each host to consider
+        :param failure_rate: failure rate which opens the circuit
+        :param min_requests: least number of requests before the circuit can open
+        :param pause: seconds to wait before probing the host again
+        :param logger: logger which records when a circuit opens and closes
+        """
+        self.window = window
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.pause = pause
+        self.logger = logger
+        self.condition = threading.Condition()
+        self.circuits = {}
+
+    def wait(self, host):
+        """
+        Block while the circuit of "host" is open.
+        :param host: host name
+        :return: no return
+        """
+        with self.condition:
+            while True:
+                remaining = self.__pass(host)
+                if remaining <= 0:
+                    return
+                self.condition.wait(remaining)
+
+    def check(self, host):
+        """
+        Check the circuit of "host" without blocking, for callers which cannot
+        block such as coroutines.
+        :param host: host name
+        :return: 0 if a request may be sent now, otherwise seconds to wait
+        before checking again
+        """
+        with self.condition:
+            return max(0.0, self.__pass(host))
+
+    def record(self, host, is_successful):
+        """
+        Record the result of a request to "host".
+        :param host: host name
+        :param is_successful: whether the host answered properly
+        :return: no return
+        """
+        with self.condition:
+            circuit = self.__get_circuit(host)
+            results = circuit['results']
+
+            if circuit['state'] == self.HALF_OPEN:
+                if is_successful:
+                    circuit['state'] = self.CLOSED
+                    results.clear()
+                    self.__log("服务器恢复 {}".format(host))
+                else:
+                    circuit['state'] = self.OPEN
+                    circuit['opened'] = time.monotonic()
+                self.condition.notify_all()
+                return
+
+            results.append(is_successful)
+            if (circuit['state'] == self.CLOSED and len(results) >= self.min_requests and
+                    results.count(False) / len(results) >= self.failure_rate):
+                circuit['state'] = self.OPEN
+                circuit['opened'] = time.monotonic()
+                self.__log("服务器异常 暂停{}秒 {}".format(self.pause, host))
+
+    def __pass(self, host):
+        """
+        Let a request to "host" through if its circuit allows it. The caller
+        holds the condition.
+        :param host: host name
+        :return: seconds left until the circuit may be probed, 0 or less if the
+        request may be sent
+        """
+        circuit = self.__get_circuit(host)
+        if circuit['state'] == self.CLOSED:
+            return 0.0
+        remaining = circuit['opened'] + self.pause - time.monotonic()
+        if remaining <= 0:
+            # probe the host, again if the last probe got no answer within "pause"
+            circuit['state'] = self.HALF_OPEN
+            circuit['opened'] = time.monotonic()
+        return remaining
+
+    def __get_circuit(self, host):
+        """
+        Get the state of the circuit of "host".
+        :param host: host name
+        :return: dict of state, the time it opened and the latest results
+        """
+        circuit = self.circuits.get(host)
+        if circuit is None:
+            circuit = self.circuits[host] = {'state': self.CLOSED, 'opened': 0.0,
+                                             'results': deque(maxlen=self.window)}
+        return circuit
+
+    def __log(self, message):
+        """
+        Log a change of a circuit.
+        :param message: message
+        :return: no return
+        """
+        if self.logger is not None:
+            self.logger.warning(message)
@@ -0,0 +1,75 @@
+# -- coding: utf-8 --
+
+import re
+import json
+import base64
+import threading
+
+
+class FStateTemplate(object):
+    FIELD_PATTERN = re.compile(r'\$\{(\w+)\}')
+
+    def __init__(self, template_path):
+        """
+        Initialize the class named FStateTemplate. The FineUI state in
+        "template_path" is parsed once, the fields written as "${name}" are
+        filled in for every account when rendering.
+        :param template_path: path of the json file of the FineUI state
+        """
+        with open(template_path, encoding='utf8') as f:
+            text = json.dumps(json.load(f), ensure_ascii=False, separators=(',', ':'))
+
+        self.parts = self.FIELD_PATTERN.split(text)
+        self.lock = threading.Lock()
+        self.compiled = {}
+
+    def render(self, fixed, **values):
+        """
+        Get the encoded F_STATE.
+        :param fixed: dict of fields which are the same for every account of
+        one report, e.g. the title, the static parts are cached for each of them
+        :param values: fields which differ between accounts
+        :return: base64 encoded F_STATE
+        """
+        parts, names = self.__compile(fixed)
+
+        chunks = [parts[0]]
+        for i, name in enumerate(names):
+            chunks.append(self.__escape(values[name]))
+            chunks.append(parts[i + 1])
+        return base64.b64encode(b''.join(chunks))
+
+    def __compile(self, fixed):
+        """
+        Fill in the fixed fields and encode the static parts.
+        :param fixed: dict of fields which are the same for every account
+        :return: list of encoded static parts and list of the remaining field
+        names between them
+        """
+        key = tuple(sorted(fixed.items()))
+        compiled = self.compiled.get(key)
+        if compiled is not None:
+            return compiled
+
+        parts, names = [self.parts[0]], []
+        for i in range(1, len(self.parts), 2):
+            name = self.parts[i]
+            if name in fixed:
+                parts[-1] += self.__escape(fixed[name]).decode('utf-8') + self.parts[i + 1]
+            else:
+                names.append(name)
+                parts.append(self.parts[i + 1])
+        compiled = ([part.encode('utf-8') for part in parts], names)
+
+        with self.lock:
+            self.compiled[key] = compiled
+        return compiled
+
+    @staticmethod
+    def __escape(value):
+        """
+        Escape a field so that it can be placed inside a json string.
+        :param value: value of the field
+        :return: utf-8 encoded escaped value
+        """
+        return json.dumps(str(value), ensure_ascii=False)[1:-1].encode('utf-8')
@@ -0,0 +1,131 @@
+# -- coding: utf-8 --
+
+import os
+import time
+import uuid
+import sqlite3
+import threading
+import datetime as dt
+
+
+class JobStore(object):
+    PENDING = 'pending'
+    IN_FLIGHT = 'in_flight'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, db_path, keep_days=7):
+        """
+        Initialize the class named JobStore, a SQLite table of the state of every
+        account in every report (day and slot "t"). A job is pending until its
+        report starts, in flight while it is reported, then done or failed.
+        Jobs left in flight by a process which died are put back to pending, as
+        it is unknown whether their report reached the server.
+        :param db_path: path of the database file
+        :param keep_days: days after which the jobs are deleted
+        """
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        self.lock = threading.Lock()
+        # marks the jobs started by this process, which it may claim again
+        self.owner = uuid.uuid4().hex
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            day TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            account TEXT NOT NULL,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            updated REAL NOT NULL,
+            owner TEXT,
+            PRIMARY KEY (day, slot, account))''')
+        if 'owner' not in [row[1] for row in self.conn.execute('PRAGMA table_info(jobs)')]:
+            self.conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+
+        oldest = (dt.date.today() - dt.timedelta(days=keep_days)).isoformat()
+        with self.lock:
+            self.conn.execute('DELETE FROM jobs WHERE day < ?', (oldest,))
+            self.recovered = self.conn.execute('UPDATE jobs SET state = ?, updated = ? WHERE state = ?',
+                                               (self.PENDING, time.time(), self.IN_FLIGHT)).rowcount
+
+    def claim(self, day, slot, accounts):
+        """
+        Add the jobs of a report which do not exist yet, and get the ones which
+        are still to be reported. The jobs stay pending until start is called,
+        and the jobs left in flight by an earlier try of this process, e.g. one
+        which raised, are put back to pending.
+        :param day: day of the report, e.g. 2020-11-26
+        :param slot: 1 for the morning report, 2 for the night report
+        :param accounts: account ids
+        :return: set of the claimed account ids, i.e. those still to be reported
+        """
+        accounts = [str(account) for account in accounts]
+        now = time.time()
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.executemany('INSERT OR IGNORE INTO jobs (day, slot, account, state, updated) '
+                                      'VALUES (?, ?, ?, ?, ?)',
+                                      [(day, slot, account, self.PENDING, now) for account in accounts])
+                self.conn.execute('UPDATE jobs SET state = ?, updated = ? '
+                                  'WHERE day = ? AND slot = ? AND state = ? AND owner = ?',
+                                  (self.PENDING, now, day, slot, self.IN_FLIGHT, self.owner))
+                states = dict(self.conn.execute('SELECT account, state FROM jobs WHERE day = ? AND slot = ?',
+                                                (day, slot)).fetchall())
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return {account for account in accounts if states[account] in (self.PENDING, self.FAILED)}
+
+    def start(self, day, slot, account):
+        """
+        Mark a claimed job as in flight when its report starts.
+        :param day: day of the report
+        :param slot: slot of the report
+        :param account: account id
+        :return: whether the job was started, False if it is already in flight
+        or done, e.g. started by another process
+        """
+        with self.lock:
+            return self.conn.execute('UPDATE jobs SET state = ?, attempts = attempts + 1, updated = ?, owner = ? '
+                                     'WHERE day = ? AND slot = ? AND account = ? AND state IN (?, ?)',
+                                     (self.IN_FLIGHT, time.time(), self.owner, day, slot, str(account),
+                                      self.PENDING, self.FAILED)).rowcount > 0
+
+    def finish(self, day, slot, account, is_successful):
+        """
+        Record the result of a job.
+        :param day: day of the report
+        :param slot: slot of the report
+        :param account: account id
+        :param is_successful: the status of "selfreport"
+        :return: no return
+        """
+        with self.lock:
+            self.conn.execute('UPDATE jobs SET state = ?, updated = ? WHERE day = ? AND slot = ? AND account = ?',
+                              (self.DONE if is_successful else self.FAILED, time.time(), day, slot, str(account)))
+
+    def count(self, day, slot, accounts=None):
+        """
+        Count the jobs of a report by state.
+        :param day: day of the report
+        :param slot: slot of the report
+        :param accounts: account ids whose jobs are counted, None for all
+        :return: dict of state -> number of jobs
+        """
+        with self.lock:
+            if accounts is None:
+                return dict(self.conn.execute('SELECT state, COUNT(*) FROM jobs WHERE day = ? AND slot = ? '
+                                              'GROUP BY state', (day, slot)).fetchall())
+            states = dict(self.conn.execute('SELECT account, state FROM jobs WHERE day = ? AND slot = ?',
+                                            (day, slot)).fetchall())
+        counts = {}
+        for account in accounts:
+            state = states.get(str(account))
+            if state is not None:
+                counts[state] = counts.get(state, 0) + 1
+        return counts
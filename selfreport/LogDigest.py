@@ -0,0 +1,122 @@
+# -- coding: utf-8 --
+
+import gzip
+import shutil
+import tempfile
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+STATUSES = ('成功', '失败', '异常')
+
+
+class LogDigest(object):
+    def __init__(self, max_failures=100):
+        """
+        Initialize the class named LogDigest, a summary of the log of the day:
+        the number of lines by level, the number of results by stage and status
+        (e.g. "登录1 失败"), and the first failures. Logs are read line by line,
+        so the memory used does not depend on their size.
+        :param max_failures: number of failures which are listed, the others
+        are only counted
+        """
+        self.max_failures = max_failures
+        self.lines = 0
+        self.levels = {}
+        self.results = {}
+        self.failures = []
+        self.failure_count = 0
+        self.missing = []
+
+    def add_file(self, log_path, label=None):
+        """
+        Add a log file to the digest.
+        :param log_path: path of the log file
+        :param label: name of the log shown in the list of failures, e.g. the
+        shard, None to show none
+        :return: no return
+        """
+        try:
+            with open(log_path, encoding='utf8', errors='replace') as f:
+                for line in f:
+                    self.add_line(line, label)
+        except FileNotFoundError:
+            self.missing.append(label or log_path)
+
+    def add_line(self, line, label=None):
+        """
+        Add a line of the log, in the format "LEVEL date time message".
+        Lines which do not start with a level, such as those of tracebacks, are
+        counted but not parsed.
+        :param line: line of the log
+        :param label: name of the log shown in the list of failures
+        :return: no return
+        """
+        self.lines += 1
+        parts = line.rstrip('\n').split(' ', 3)
+        if len(parts) < 4 or parts[0] not in LEVELS:
+            return
+        level, _, time, message = parts
+        self.levels[level] = self.levels.get(level, 0) + 1
+
+        words = message.split(' ')
+        status = words[1] if len(words) > 1 and words[1] in STATUSES else None
+        if status is not None:
+            key = (words[0], status)
+            self.results[key] = self.results.get(key, 0) + 1
+
+        if status in ('失败', '异常') or level in ('ERROR', 'CRITICAL'):
+            self.failure_count += 1
+            if len(self.failures) < self.max_failures:
+                self.failures.append("{} {}{}".format(time.split(',')[0], "[{}] ".format(label) if label else '',
+                                                      message[:200]))
+
+    def render(self, title):
+        """
+        Render the digest as the text of an email.
+        :param title: first line of the text
+        :return: text
+        """
+        lines = [title, '', "日志共{}行".format(self.lines)]
+        if self.levels:
+            lines.append('，'.join("{} {}".format(level, self.levels[level]) for level in LEVELS
+                                  if level in self.levels))
+        if self.missing:
+            lines.append("无日志：{}".format('，'.join(self.missing)))
+
+        lines += ['', '各阶段结果：']
+        stages = []
+        for stage, _ in self.results:
+            if stage not in stages:
+                stages.append(stage)
+        for stage in stages:
+            lines.append("{} {}".format(stage, ' '.join("{} {}".format(status, self.results[(stage, status)])
+                                                        for status in STATUSES if (stage, status) in self.results)))
+        if not stages:
+            lines.append('无')
+
+        if self.failure_count > len(self.failures):
+            lines += ['', "失败记录（前{}条，共{}条）：".format(len(self.failures), self.failure_count)]
+        else:
+            lines += ['', "失败记录（共{}条）：".format(self.failure_count)]
+        lines += self.failures or ['无']
+        return '\n'.join(lines)
+
+    @staticmethod
+    def compress(log_path, max_bytes):
+        """
+        Compress a log file with gzip through a temporary file, so that the log
+        is never held in memory uncompressed.
+        :param log_path: path of the log file
+        :param max_bytes: largest size of the compressed log
+        :return: the compressed log, None if the file does not exist or the
+        compressed log is larger than "max_bytes"
+        """
+        try:
+            with open(log_path, 'rb') as src, tempfile.TemporaryFile() as tmp:
+                with gzip.GzipFile(fileobj=tmp, mode='wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                if tmp.tell() > max_bytes:
+                    return None
+                tmp.seek(0)
+                return tmp.read()
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,165 @@
+# -- coding: utf-8 --
+
+import os
+import re
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import threading
+from logging.handlers import QueueHandler, TimedRotatingFileHandler
+
+
+class BatchFileHandler(TimedRotatingFileHandler):
+    def __init__(self, filename, backup_count=30, compress=False):
+        """
+        Initialize the class named BatchFileHandler, a log file rotated at
+        midnight into "filename.%Y-%m-%d.log", which is only flushed when
+        LogWriter has written a batch of records.
+        :param filename: path of the log file
+        :param backup_count: number of rotated files which are kept
+        :param compress: whether rotated files are compressed into
+        "filename.%Y-%m-%d.log.gz"
+        """
+        super().__init__(filename=filename, when="MIDNIGHT", interval=1, backupCount=backup_count,
+                         encoding='utf-8')
+        self.suffix = "%Y-%m-%d.log"
+        # newer versions of Python match the parts of the suffix between dots
+        self.extMatch = re.compile(r"^\d{4}-\d{2}-\d{2}(\.log)?(\.gz)?$")
+        if compress:
+            self.namer = lambda name: name + '.gz'
+            self.rotator = self.__compress
+
+    def flush(self):
+        # called after every record by StreamHandler.emit, LogWriter calls flush_batch instead
+        pass
+
+    def flush_batch(self):
+        """
+        Flush the records written since the last batch.
+        :return: no return
+        """
+        super().flush()
+
+    def close(self):
+        self.flush_batch()
+        super().close()
+
+    @staticmethod
+    def __compress(source, dest):
+        """
+        Compress a rotated log file.
+        :param source: path of the log file
+        :param dest: path of the compressed file
+        :return: no return
+        """
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+class LogWriter(object):
+    STOP = object()
+
+    def __init__(self, flush_interval=1.0):
+        """
+        Initialize the class named LogWriter, a single thread which writes the
+        records of several loggers to their files. Loggers only put records
+        into a queue, so that the threads and coroutines which log never wait
+        for the disk, and the files are flushed once per batch.
+        :param flush_interval: longest time in seconds a record may wait before
+        it is flushed to disk
+        """
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self.handlers = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, logger, handler):
+        """
+        Write the records of "logger" through "handler" in the writer thread.
+        :param logger: logging.Logger
+        :param handler: BatchFileHandler
+        :return: no return
+        """
+        self.handlers[logger.name] = handler
+        logger.addHandler(QueueHandler(self.queue))
+        self.__start()
+
+    def flush(self):
+        """
+        Block until the records queued so far are written and flushed, e.g.
+        before reading a log file.
+        :return: no return
+        """
+        if self.thread is None:
+            return
+        flushed = threading.Event()
+        self.queue.put(flushed)
+        flushed.wait()
+
+    def stop(self):
+        """
+        Write the queued records, flush and close the files, and stop the
+        writer thread.
+        :return: no return
+        """
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        self.queue.put(self.STOP)
+        thread.join()
+        for handler in self.handlers.values():
+            handler.close()
+
+    def __start(self):
+        """
+        Start the writer thread if it is not running.
+        :return: no return
+        """
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.__run, name='log-writer', daemon=True)
+            self.thread.start()
+        atexit.register(self.stop)
+
+    def __run(self):
+        """
+        Write records as they come, and flush the files which have been written
+        to once "flush_interval" has passed since the last flush.
+        :return: no return
+        """
+        dirty = set()
+        last_flush = time.monotonic()
+        while True:
+            try:
+                timeout = max(0.0, last_flush + self.flush_interval - time.monotonic()) if dirty else None
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+
+            if record is self.STOP:
+                for handler in dirty:
+                    handler.flush_batch()
+                return
+            if isinstance(record, threading.Event):
+                for handler in dirty:
+                    handler.flush_batch()
+                dirty.clear()
+                last_flush = time.monotonic()
+                record.set()
+            elif record is not None:
+                handler = self.handlers.get(record.name)
+                if handler is not None:
+                    handler.handle(record)
+                    dirty.add(handler)
+
+            if dirty and time.monotonic() - last_flush >= self.flush_interval:
+                for handler in dirty:
+                    handler.flush_batch()
+                dirty.clear()
+                last_flush = time.monotonic()
@@ -0,0 +1,156 @@
+# -- coding: utf-8 --
+
+import queue
+import smtplib
+import threading
+from contextlib import nullcontext
+
+from selfreport.RetryPolicy import RetryPolicy
+
+
+class MailDispatcher(object):
+    # the server refused the message, but the connection is still usable
+    REJECTIONS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+    def __init__(self, logger, connections=1, idle_timeout=60, retry_policy=None, circuit_breaker=None,
+                 stage_timer=None):
+        """
+        Initialize the class named MailDispatcher. Messages are queued and sent
+        by background workers, each of which keeps one logged in SMTP
+        connection open while there are messages to send.
+        :param logger: logger used to record whether the emails were sent
+        :param connections: number of workers, i.e. SMTP connections
+        :param idle_timeout: seconds after which an idle connection is closed
+        :param retry_policy: RetryPolicy of sending one message
+        :param circuit_breaker: CircuitBreaker shared with the other hosts, the
+        SMTP server is keyed by its host name
+        :param stage_timer: StageTimer which collects how long sending each
+        message takes and whether it succeeded, None to disable
+        """
+        self.logger = logger
+        self.connections = connections
+        self.idle_timeout = idle_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.stage_timer = stage_timer
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.workers = []
+
+    def send(self, msg, email_to, sender_config):
+        """
+        Queue an email message, return immediately.
+        :param msg: email message
+        :param email_to: account to receive mail, only used for logging
+        :param sender_config: EmailConfig, the "email" part of setting_config.yaml
+        :return: no return
+        """
+        self.__start()
+        self.queue.put((msg, email_to, sender_config))
+
+    def join(self):
+        """
+        Block until all queued messages have been handled.
+        :return: no return
+        """
+        self.queue.join()
+
+    def __start(self):
+        """
+        Start the workers if they are not running.
+        :return: no return
+        """
+        with self.lock:
+            if self.workers:
+                return
+            for i in range(self.connections):
+                worker = threading.Thread(target=self.__work, name="mail-{}".format(i), daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+    def __work(self):
+        """
+        Worker loop: send queued messages through a connection which is reused
+        until it fails or has been idle for "idle_timeout" seconds.
+        :return: no return
+        """
+        server, server_config = None, None
+        while True:
+            try:
+                msg, email_to, sender_config = self.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                server = self.__close(server)
+                continue
+
+            if server is not None and server_config != sender_config:
+                server = self.__close(server)
+
+            try:
+                with self.stage_timer.stage('mail', email_to) if self.stage_timer is not None \
+                        else nullcontext({}) as stage:
+                    server, server_config = self.__send(server, server_config, msg, email_to, sender_config, stage)
+            finally:
+                self.queue.task_done()
+
+    def __send(self, server, server_config, msg, email_to, sender_config, stage):
+        """
+        Send one message, reconnecting and retrying by the RetryPolicy when the
+        connection fails. When the server refuses the message, e.g. a wrong
+        address, the connection is kept and the server is not counted as
+        failing; whether it is retried is up to the rules of the RetryPolicy.
+        :param server: the open connection or None
+        :param server_config: the sender config the connection was opened with
+        :param msg: email message
+        :param email_to: account to receive mail
+        :param sender_config: EmailConfig, the "email" part of setting_config.yaml
+        :param stage: dict in which the result and retries are recorded
+        :return: the connection and its sender config after sending
+        """
+        connection = {'server': server, 'config': server_config}
+
+        def send():
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.wait(sender_config.smtp)
+            try:
+                if connection['server'] is None:
+                    smtp = smtplib.SMTP_SSL if sender_config.ssl else smtplib.SMTP
+                    connection['server'] = smtp(sender_config.smtp, port=sender_config.port)
+                    connection['server'].login(sender_config.username, sender_config.password)
+                    connection['config'] = sender_config
+                connection['server'].send_message(msg)
+            except self.REJECTIONS:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(sender_config.smtp, True)
+                raise
+            except OSError:
+                connection['server'] = self.__close(connection['server'])
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(sender_config.smtp, False)
+                raise
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record(sender_config.smtp, True)
+
+        try:
+            self.retry_policy.run(send, stage)
+            self.logger.info("发送邮件 成功 {}".format(email_to))
+        except self.REJECTIONS as e:
+            self.logger.error("发送邮件 失败 {} {}".format(email_to, e))
+            stage['ok'] = False
+        except Exception:
+            self.logger.error("发送邮件 失败 {}".format(email_to))
+            stage['ok'] = False
+        return connection['server'], connection['config']
+
+    @staticmethod
+    def __close(server):
+        """
+        Close the connection quietly.
+        :param server: smtplib.SMTP or None
+        :return: None
+        """
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+        return None
@@ -0,0 +1,135 @@
+# -- coding: utf-8 --
+
+import json
+import threading
+import datetime as dt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from selfreport.StageTimer import StageTimer
+
+
+class Metrics(StageTimer):
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, json_logger=None, keep=0):
+        """
+        Initialize the class named Metrics. Every stage is counted by result,
+        retries and HTTP status, and its duration is put into a histogram, all
+        of which can be served in the Prometheus text format. The durations
+        themselves are not kept by default, so that a long-running process does
+        not grow with every report.
+        :param json_logger: logger which receives one json record per stage run,
+        None to disable
+        :param keep: number of the latest durations kept for every stage for
+        summary(), None to keep all
+        """
+        super().__init__(keep)
+        self.json_logger = json_logger
+        self.results = {}
+        self.retries = {}
+        self.statuses = {}
+        self.histograms = {}
+        self.server = None
+
+    def observe(self, name, account, seconds, ok=True, retries=0, status=None):
+        """
+        Record one run of a stage.
+        :param name: name of the stage
+        :param account: account id
+        :param seconds: duration
+        :param ok: whether the stage succeeded
+        :param retries: times the stage was retried
+        :param status: HTTP status code of the last response, if any
+        :return: no return
+        """
+        super().observe(name, account, seconds, ok, retries, status)
+
+        result = 'ok' if ok else 'fail'
+        with self.lock:
+            self.results[(name, result)] = self.results.get((name, result), 0) + 1
+            self.retries[name] = self.retries.get(name, 0) + retries
+            if status is not None:
+                self.statuses[(name, status)] = self.statuses.get((name, status), 0) + 1
+
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = [[0] * len(self.BUCKETS), 0, 0.0]
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += 1
+            histogram[2] += seconds
+
+        if self.json_logger is not None:
+            self.json_logger.info(json.dumps({
+                'time': dt.datetime.now().isoformat(timespec='milliseconds'),
+                'stage': name,
+                'account': account,
+                'seconds': round(seconds, 6),
+                'ok': ok,
+                'retries': retries,
+                'status': status
+            }, ensure_ascii=False))
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text format.
+        :return: text
+        """
+        lines = []
+        with self.lock:
+            lines.append('# HELP selfreport_stage_duration_seconds Duration of each stage of selfreport.')
+            lines.append('# TYPE selfreport_stage_duration_seconds histogram')
+            for name, (buckets, count, total) in sorted(self.histograms.items()):
+                for bound, bucket in zip(self.BUCKETS, buckets):
+                    lines.append('selfreport_stage_duration_seconds_bucket{{stage="{}",le="{}"}} {}'.format(
+                        name, bound, bucket))
+                lines.append('selfreport_stage_duration_seconds_bucket{{stage="{}",le="+Inf"}} {}'.format(name, count))
+                lines.append('selfreport_stage_duration_seconds_sum{{stage="{}"}} {}'.format(name, total))
+                lines.append('selfreport_stage_duration_seconds_count{{stage="{}"}} {}'.format(name, count))
+
+            lines.append('# HELP selfreport_stage_total Runs of each stage of selfreport by result.')
+            lines.append('# TYPE selfreport_stage_total counter')
+            for (name, result), count in sorted(self.results.items()):
+                lines.append('selfreport_stage_total{{stage="{}",result="{}"}} {}'.format(name, result, count))
+
+            lines.append('# HELP selfreport_stage_retries_total Retries of each stage of selfreport.')
+            lines.append('# TYPE selfreport_stage_retries_total counter')
+            for name, count in sorted(self.retries.items()):
+                lines.append('selfreport_stage_retries_total{{stage="{}"}} {}'.format(name, count))
+
+            lines.append('# HELP selfreport_http_responses_total HTTP responses of each stage by status code.')
+            lines.append('# TYPE selfreport_http_responses_total counter')
+            for (name, status), count in sorted(self.statuses.items()):
+                lines.append('selfreport_http_responses_total{{stage="{}",status="{}"}} {}'.format(
+                    name, status, count))
+
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, host, port):
+        """
+        Serve the metrics at http://host:port/metrics in a background thread.
+        :param host: host to listen on
+        :param port: port to listen on
+        :return: no return
+        """
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
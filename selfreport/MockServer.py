@@ -0,0 +1,249 @@
+# -- coding: utf-8 --
+
+import json
+import time
+import base64
+import random
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, accounts=None, latency=0.0, error_rate=0.0, drop_rate=0.0, session_ttl=3600):
+        """
+        Initialize the class named MockServer, a local stand-in for both
+        selfreport.shu.edu.cn and newsso.shu.edu.cn. Point "selfreport_url" and
+        "newsso_url" of setting_config.yaml to it.
+        :param address: (host, port) to listen on, port 0 picks a free port
+        :param accounts: dict of account id -> password, None accepts any password
+        :param latency: seconds every response is delayed, jittered by +-50%
+        :param error_rate: probability of answering with a 500 error
+        :param drop_rate: probability of closing the connection without answering
+        :param session_ttl: seconds a logged in session stays valid
+        """
+        super().__init__(address, MockHandler)
+        self.accounts = accounts
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.session_ttl = session_ttl
+        self.lock = threading.Lock()
+        self.sso_sessions = {}
+        self.report_sessions = {}
+        self.codes = {}
+        self.stats = {'requests': {}, 'errors': 0, 'drops': 0, 'logins': 0, 'reports': {}}
+
+    @property
+    def url(self):
+        """
+        Base url of the server.
+        :return: url
+        """
+        return "http://{}:{}".format(*self.server_address[:2])
+
+    def count(self, key, name=None):
+        """
+        Increase a counter of the statistics.
+        :param key: name of the counter, or of the dict of counters
+        :param name: name of the counter in the dict
+        :return: no return
+        """
+        with self.lock:
+            if name is None:
+                self.stats[key] += 1
+            else:
+                self.stats[key][name] = self.stats[key].get(name, 0) + 1
+
+    def new_session(self, sessions, account):
+        """
+        Create a session which expires after "session_ttl" seconds.
+        :param sessions: dict of token -> (account, expiry time)
+        :param account: account id
+        :return: token
+        """
+        token = secrets.token_hex(16)
+        with self.lock:
+            sessions[token] = (account, time.time() + self.session_ttl)
+        return token
+
+    def get_session(self, sessions, token):
+        """
+        Get the account of a session which has not expired.
+        :param sessions: dict of token -> (account, expiry time)
+        :param token: token from the cookie
+        :return: account id, None if not logged in
+        """
+        with self.lock:
+            entry = sessions.get(token)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del sessions[token]
+                return None
+            return entry[0]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    SSO_COOKIE = 'SHU_SSO'
+    REPORT_COOKIE = '.ncov2019selfreport'
+    VIEW_STATE_GENERATOR = 'DC4D08A3'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.__handle('GET')
+
+    def do_POST(self):
+        self.__handle('POST')
+
+    def __handle(self, method):
+        """
+        Inject latency and failures, then dispatch by path.
+        :param method: GET or POST
+        :return: no return
+        """
+        server = self.server
+        path = urlsplit(self.path).path
+        server.count('requests', "{} {}".format(method, path))
+
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        if server.drop_rate and random.random() < server.drop_rate:
+            server.count('drops')
+            self.close_connection = True
+            return
+        if server.error_rate and random.random() < server.error_rate:
+            server.count('errors')
+            self.__send(500, 'Internal Server Error')
+            return
+
+        routes = {
+            ('GET', '/Default.aspx'): self.__default,
+            ('GET', '/login'): self.__login_page,
+            ('POST', '/login'): self.__login,
+            ('GET', '/oauth/authorize'): self.__authorize,
+            ('GET', '/LoginSSO.aspx'): self.__login_sso,
+            ('GET', '/XueSFX/HalfdayReport.aspx'): self.__report_page,
+            ('POST', '/XueSFX/HalfdayReport.aspx'): self.__submit,
+            ('GET', '/__stats'): self.__stats
+        }
+        route = routes.get((method, path))
+        if route is None:
+            self.__send(404, 'Not Found')
+        else:
+            route()
+
+    def __default(self):
+        if self.__report_account() is None:
+            self.__redirect('/login')
+        else:
+            self.__send(200, '<html><body>每日两报</body></html>')
+
+    def __login_page(self):
+        self.__send(200, '<html><body><form method="post" action="/login">'
+                         '<input name="username"/><input type="password" name="password"/>'
+                         '</form></body></html>')
+
+    def __login(self):
+        form = self.__read_form()
+        account, password = form.get('username', ''), form.get('password', '')
+        accounts = self.server.accounts
+        if not account or (accounts is not None and accounts.get(account) != password):
+            self.__send(200, '<html><body>用户名或密码错误</body></html>')
+            return
+        self.server.count('logins')
+        token = self.server.new_session(self.server.sso_sessions, account)
+        self.__redirect('/Default.aspx', {self.SSO_COOKIE: token})
+
+    def __authorize(self):
+        account = self.server.get_session(self.server.sso_sessions, self.__cookies().get(self.SSO_COOKIE))
+        if account is None:
+            self.__redirect('/login')
+            return
+        code = secrets.token_hex(8)
+        with self.server.lock:
+            self.server.codes[code] = account
+        query = parse_qs(urlsplit(self.path).query)
+        redirect_uri = query.get('redirect_uri', ['/LoginSSO.aspx?ReturnUrl=%2fDefault.aspx'])[0]
+        self.__redirect("{}{}code={}".format(redirect_uri, '&' if '?' in redirect_uri else '?', code))
+
+    def __login_sso(self):
+        code = parse_qs(urlsplit(self.path).query).get('code', [''])[0]
+        with self.server.lock:
+            account = self.server.codes.pop(code, None)
+        if account is None:
+            self.__redirect('/login')
+            return
+        token = self.server.new_session(self.server.report_sessions, account)
+        self.__redirect('/Default.aspx', {self.REPORT_COOKIE: token})
+
+    def __report_page(self):
+        account = self.__report_account()
+        if account is None:
+            self.__redirect('/Default.aspx')
+            return
+        self.__send(200, '<html><body><form method="post" id="form1">'
+                         '<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{}" />'
+                         '<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="{}" />'
+                         '</form></body></html>'.format(self.__view_state(account), self.VIEW_STATE_GENERATOR))
+
+    def __submit(self):
+        account = self.__report_account()
+        form = self.__read_form()
+        try:
+            f_state = json.loads(base64.b64decode(form.get('F_STATE', '')).decode('utf-8'))
+        except ValueError:
+            f_state = None
+        if (account is None or form.get('__VIEWSTATE') != self.__view_state(account) or
+                not isinstance(f_state, dict) or 'p1_BaoSRQ' not in f_state):
+            self.__send(200, 'F.alert("提交失败");')
+            return
+        self.server.count('reports', account)
+        self.__send(200, 'F.alert({message:"提交成功",target:"_self"});')
+
+    def __stats(self):
+        with self.server.lock:
+            body = json.dumps(self.server.stats, ensure_ascii=False)
+        self.__send(200, body, 'application/json; charset=utf-8')
+
+    def __report_account(self):
+        return self.server.get_session(self.server.report_sessions, self.__cookies().get(self.REPORT_COOKIE))
+
+    @staticmethod
+    def __view_state(account):
+        return base64.b64encode("viewstate-{}".format(account).encode('utf-8')).decode('ascii')
+
+    def __cookies(self):
+        cookies = {}
+        for part in self.headers.get('Cookie', '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name:
+                cookies[name] = value
+        return cookies
+
+    def __read_form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        return {name: values[0] for name, values in parse_qs(body, keep_blank_values=True).items()}
+
+    def __redirect(self, location, cookies=None):
+        self.send_response(302)
+        self.send_header('Location', location)
+        for name, value in (cookies or {}).items():
+            self.send_header('Set-Cookie', "{}={}; Path=/; HttpOnly".format(name, quote(value)))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def __send(self, status, body, content_type='text/html; charset=utf-8'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
@@ -0,0 +1,108 @@
+# -- coding: utf-8 --
+
+import threading
+import socketserver
+from email import message_from_bytes
+
+
+class MockSmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, keep=100, reject=()):
+        """
+        Initialize the class named MockSmtpServer, a local SMTP sink which
+        accepts any login and keeps the latest messages in memory. Use it with
+        "ssl: false" in the email part of setting_config.yaml.
+        :param address: (host, port) to listen on, port 0 picks a free port
+        :param keep: number of latest messages to keep
+        :param reject: recipient addresses which are refused with 550
+        """
+        super().__init__(address, MockSmtpHandler)
+        self.keep = keep
+        self.reject = set(reject)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.stats = {'connections': 0, 'logins': 0, 'messages': 0}
+
+    def count(self, key):
+        """
+        Increase a counter of the statistics.
+        :param key: name of the counter
+        :return: no return
+        """
+        with self.lock:
+            self.stats[key] += 1
+
+    def add_message(self, mail_from, rcpt_to, data):
+        """
+        Record a received message.
+        :param mail_from: envelope sender
+        :param rcpt_to: list of envelope recipients
+        :param data: raw message
+        :return: no return
+        """
+        with self.lock:
+            self.stats['messages'] += 1
+            self.messages.append((mail_from, rcpt_to, message_from_bytes(data)))
+            del self.messages[:-self.keep]
+
+
+class MockSmtpHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        server.count('connections')
+        self.__reply('220 localhost mock smtp')
+
+        mail_from, rcpt_to = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode('utf-8', 'replace').strip().partition(' ')
+            command = command.upper()
+
+            if command in ('EHLO', 'HELO'):
+                self.__reply('250-localhost', '250-AUTH PLAIN LOGIN', '250 8BITMIME')
+            elif command == 'AUTH':
+                if argument.upper().startswith('LOGIN'):
+                    self.__reply('334 VXNlcm5hbWU6')
+                    self.rfile.readline()
+                    self.__reply('334 UGFzc3dvcmQ6')
+                    self.rfile.readline()
+                server.count('logins')
+                self.__reply('235 2.7.0 Authentication successful')
+            elif command == 'MAIL':
+                mail_from, rcpt_to = argument.partition(':')[2].strip(), []
+                self.__reply('250 OK')
+            elif command == 'RCPT':
+                address = argument.partition(':')[2].strip()
+                if address.strip('<>') in server.reject:
+                    self.__reply('550 5.1.1 No such user')
+                    continue
+                rcpt_to.append(address)
+                self.__reply('250 OK')
+            elif command == 'DATA':
+                self.__reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(line[1:] if line.startswith(b'..') else line)
+                server.add_message(mail_from, rcpt_to, b''.join(data))
+                self.__reply('250 OK')
+            elif command == 'RSET':
+                mail_from, rcpt_to = None, []
+                self.__reply('250 OK')
+            elif command == 'NOOP':
+                self.__reply('250 OK')
+            elif command == 'QUIT':
+                self.__reply('221 Bye')
+                return
+            else:
+                self.__reply('502 Command not implemented')
+
+    def __reply(self, *lines):
+        self.wfile.write(''.join(line + '\r\n' for line in lines).encode('utf-8'))
@@ -0,0 +1,50 @@
+# -- coding: utf-8 --
+
+import time
+import threading
+from urllib.parse import urlsplit
+
+
+class RateLimiter(object):
+    def __init__(self, host_rates):
+        """
+        Initialize the class named RateLimiter, a token bucket per host which
+        holds at least one token, so that rates below 1 request per second
+        still let requests through.
+        :param host_rates: dict of host name -> maximum requests per second, 0 or
+        missing means no limit
+        """
+        self.host_rates = {host: float(rate) for host, rate in (host_rates or {}).items() if rate and rate > 0}
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def acquire(self, url):
+        """
+        Block until a request to the host of "url" is allowed.
+        :param url: the url which is going to be requested
+        :return: no return
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def reserve(self, url):
+        """
+        Take a token for a request to the host of "url" without blocking. When
+        the bucket is empty the token is borrowed from the future, so callers
+        which cannot block, such as coroutines, wait the returned time instead.
+        :param url: the url which is going to be requested
+        :return: seconds to wait before sending the request
+        """
+        host = urlsplit(url).hostname
+        rate = self.host_rates.get(host)
+        if rate is None:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            capacity = max(rate, 1.0)
+            tokens, last = self.buckets.get(host, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate) - 1
+            self.buckets[host] = (tokens, now)
+        return max(0.0, -tokens / rate)
@@ -0,0 +1,119 @@
+# -- coding: utf-8 --
+
+import time
+import random
+import asyncio
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+
+class UnsentError(ConnectionError):
+    """
+    A network error raised before the request was sent, such as a refused
+    connection, which can be retried even if the request is not idempotent.
+    """
+
+
+class RetryPolicy(object):
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=30.0, jitter=0.5, rules=None):
+        """
+        Initialize the class named RetryPolicy: exponential backoff with jitter.
+        Network errors (OSError, which includes the errors of requests and
+        smtplib) are retried up to "max_retries" times, other errors are not.
+        :param max_retries: times to retry a network error
+        :param base_delay: seconds to wait before the first retry, doubled for
+        every further retry
+        :param max_delay: longest wait between two tries
+        :param jitter: the wait is randomly scaled by 1 +- jitter
+        :param rules: dict of error class name -> times to retry, overriding
+        "max_retries" for that class and its subclasses
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.rules = rules or {}
+
+    def run(self, func, stage=None, idempotent=True):
+        """
+        Call "func" until it returns, retrying the errors allowed by the rules.
+        :param func: callable without parameters
+        :param stage: dict in which the number of retries is counted, if any
+        :param idempotent: whether "func" may be called again after its request
+        may have reached the server, if not only the errors for which is_unsent
+        holds are retried
+        :return: the return value of "func", the last error is raised when
+        retries are used up
+        """
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                if attempt >= self.get_retries(e) or not (idempotent or self.is_unsent(e)):
+                    raise
+            time.sleep(self.get_delay(attempt))
+            attempt += 1
+            if stage is not None:
+                stage['retries'] = stage.get('retries', 0) + 1
+
+    async def run_async(self, func, stage=None, idempotent=True):
+        """
+        Await "func" until it returns, retrying like "run" without blocking the
+        event loop.
+        :param func: coroutine function without parameters
+        :param stage: dict in which the number of retries is counted, if any
+        :param idempotent: whether "func" may be awaited again after its request
+        may have reached the server
+        :return: the return value of "func", the last error is raised when
+        retries are used up
+        """
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                if attempt >= self.get_retries(e) or not (idempotent or self.is_unsent(e)):
+                    raise
+            await asyncio.sleep(self.get_delay(attempt))
+            attempt += 1
+            if stage is not None:
+                stage['retries'] = stage.get('retries', 0) + 1
+
+    def get_retries(self, error):
+        """
+        Get how many times an error may be retried.
+        :param error: the exception
+        :return: times to retry
+        """
+        for cls in type(error).__mro__:
+            if cls.__name__ in self.rules:
+                return self.rules[cls.__name__]
+        return self.max_retries if isinstance(error, OSError) else 0
+
+    @staticmethod
+    def is_unsent(error):
+        """
+        Check whether an error leaves the request safe to send again: the
+        connection to the server could not be made, or the server answered with
+        a server error.
+        :param error: the exception
+        :return: whether the request can be sent again
+        """
+        if isinstance(error, (UnsentError, requests.ConnectTimeout)):
+            return True
+        if isinstance(error, requests.ConnectionError):
+            reason = getattr(error.args[0], 'reason', None) if error.args else None
+            return isinstance(reason, NewConnectionError)
+        response = getattr(error, 'response', None)
+        return response is not None and response.status_code >= 500
+
+    def get_delay(self, attempt):
+        """
+        Get the wait before the next try.
+        :param attempt: number of retries made so far
+        :return: seconds
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
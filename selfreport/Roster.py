@@ -0,0 +1,69 @@
+# -- coding: utf-8 --
+
+import os
+import threading
+
+import yaml
+
+Loader = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+
+
+class Account(object):
+    __slots__ = ('id', 'pwd', 'email_to', 'campus', 'county', 'address')
+
+    def __init__(self, person_info):
+        """
+        Initialize the class named Account, one entry of person_config.yaml.
+        Fields can be read both as attributes and as dict items.
+        :param person_info: dict read from person_config.yaml
+        """
+        for field in self.__slots__:
+            value = person_info.get(field)
+            setattr(self, field, None if value is None else str(value))
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+
+class Roster(object):
+    def __init__(self, person_config_path):
+        """
+        Initialize the class named Roster, the accounts of person_config.yaml
+        indexed by account id. The file is parsed again only when it changes.
+        :param person_config_path: path of person_config.yaml
+        """
+        self.person_config_path = person_config_path
+        self.lock = threading.Lock()
+        self.signature = None
+        self.accounts = ()
+        self.index = {}
+
+    def reload(self):
+        """
+        Parse person_config.yaml if its modification time or size changed.
+        :return: self
+        """
+        stat = os.stat(self.person_config_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if signature != self.signature:
+                with open(self.person_config_path, encoding='utf8') as f:
+                    accounts = tuple(Account(person_info) for person_info in yaml.load(f, Loader=Loader) or ())
+                self.accounts = accounts
+                self.index = {account.id: account for account in accounts}
+                self.signature = signature
+        return self
+
+    def get(self, account):
+        """
+        Find an account by id.
+        :param account: account id
+        :return: Account, None if not found
+        """
+        return self.index.get(str(account))
+
+    def __iter__(self):
+        return iter(self.accounts)
+
+    def __len__(self):
+        return len(self.accounts)
@@ -0,0 +1,163 @@
+# -- coding: utf-8 --
+
+import os
+import json
+import heapq
+import logging
+import itertools
+import threading
+import datetime as dt
+from collections import deque
+
+
+class DailyJob(object):
+    def __init__(self, name, hour, minute, action, catch_up):
+        """
+        Initialize the class named DailyJob, a job which fires once a day.
+        :param name: name of the job, used to remember when it last fired
+        :param hour: hour to fire
+        :param minute: minute to fire
+        :param action: callable which receives the time the job was due
+        :param catch_up: whether a run missed while the program was not running
+        should be made up
+        """
+        self.name = name
+        self.hour = hour
+        self.minute = minute
+        self.action = action
+        self.catch_up = catch_up
+
+
+class Scheduler(object):
+    def __init__(self, now, state_path, catch_up_minutes, logger=None):
+        """
+        Initialize the class named Scheduler, a priority queue of the next time
+        every job is due.
+        :param now: callable which returns the current time
+        :param state_path: path of the file which records when each job last fired
+        :param catch_up_minutes: runs which were due at most this many minutes
+        ago and have not fired are made up when a job is added
+        :param logger: logger of the errors raised by jobs
+        """
+        self.now = now
+        self.logger = logger or logging.getLogger(__name__)
+        self.state_path = state_path
+        self.catch_up = dt.timedelta(minutes=catch_up_minutes)
+        self.queue = []
+        self.jobs = {}
+        self.seq = itertools.count()
+        self.calls = deque()
+        self.wakeup = threading.Event()
+        self.last_run = self.__read()
+
+    def add_daily_job(self, name, hour, minute, action, catch_up=True):
+        """
+        Add a job which fires every day at hour:minute.
+        :param name: name of the job
+        :param hour: hour to fire
+        :param minute: minute to fire
+        :param action: callable which receives the time the job was due
+        :param catch_up: whether a missed run should be made up
+        :return: no return
+        """
+        job = DailyJob(name, hour, minute, action, catch_up)
+        self.jobs[name] = job
+
+        now = self.now()
+        due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if due <= now:
+            last_run = self.last_run.get(name)
+            if not (catch_up and now - due <= self.catch_up and (last_run is None or last_run < due)):
+                due += dt.timedelta(days=1)
+        self.__push(due, job)
+
+    def clear(self):
+        """
+        Remove all jobs.
+        :return: no return
+        """
+        self.jobs.clear()
+        self.queue.clear()
+
+    def call_soon(self, action):
+        """
+        Run "action" in the thread of "run" as soon as no job is running, e.g.
+        to change the jobs from another thread.
+        :param action: callable without parameters
+        :return: no return
+        """
+        self.calls.append(action)
+        self.wakeup.set()
+
+    def run(self):
+        """
+        Sleep until the next job is due and fire it, forever. An error raised by
+        a job is logged and the job still fires the next day, but the run is not
+        recorded, so that it is made up if the program restarts in time.
+        :return: no return
+        """
+        while self.queue or self.calls:
+            while self.calls:
+                try:
+                    self.calls.popleft()()
+                except Exception as e:
+                    self.logger.exception("调度 异常 {}".format(e))
+            if not self.queue:
+                continue
+
+            due, _, job = self.queue[0]
+            delay = (due - self.now()).total_seconds()
+            if delay > 0:
+                self.wakeup.wait(delay)
+                self.wakeup.clear()
+                continue
+
+            heapq.heappop(self.queue)
+            if self.jobs.get(job.name) is not job:
+                continue
+
+            try:
+                job.action(due)
+            except Exception as e:
+                self.logger.exception("任务 异常 {} {}".format(job.name, e))
+            else:
+                self.last_run[job.name] = due
+                self.__write()
+
+            if self.jobs.get(job.name) is job:
+                self.__push(due + dt.timedelta(days=1), job)
+
+    def __push(self, due, job):
+        """
+        Queue the next time "job" is due.
+        :param due: time
+        :param job: DailyJob
+        :return: no return
+        """
+        heapq.heappush(self.queue, (due, next(self.seq), job))
+
+    def __read(self):
+        """
+        Read when each job last fired.
+        :return: dict of job name -> time
+        """
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding='utf8') as f:
+                return {name: dt.datetime.fromisoformat(t) for name, t in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def __write(self):
+        """
+        Record when each job last fired.
+        :return: no return
+        """
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            json.dump({name: t.isoformat() for name, t in self.last_run.items()}, f)
+        os.replace(tmp_path, self.state_path)
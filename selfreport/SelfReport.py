@@ -1,29 +1,65 @@
 # -- coding: utf-8 --
 
 import os
-import re
 import time
-import yaml
+import zlib
+import queue
 import random
-import base64
-import smtplib
+import asyncio
+import threading
 import logging
 import requests
 import datetime as dt
 from pathlib import Path
-from bs4 import BeautifulSoup
+from dataclasses import replace
+from contextlib import nullcontext
+from urllib.parse import urlsplit
 from email.message import EmailMessage
-from logging.handlers import TimedRotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from selfreport.RateLimiter import RateLimiter
+from selfreport.MailDispatcher import MailDispatcher
+from selfreport.FStateTemplate import FStateTemplate
+from selfreport.Scheduler import Scheduler
+from selfreport.ViewStateExtractor import ViewStateExtractor
+from selfreport.SessionCache import SessionCache
+from selfreport.JobStore import JobStore
+from selfreport.Roster import Roster
+from selfreport.Metrics import Metrics
+from selfreport.RetryPolicy import RetryPolicy
+from selfreport.CircuitBreaker import CircuitBreaker
+from selfreport.AsyncTransport import AsyncTransport, HTTPError
+from selfreport.ShardLease import ShardLease
+from selfreport.LogDigest import LogDigest
+from selfreport.LogWriter import LogWriter, BatchFileHandler
+from selfreport.SettingConfig import SettingConfig, ConfigWatcher
+from selfreport.ValidationReport import ValidationReport
 
 
 class SelfReport(object):
-    def __init__(self, setting_config_path, person_config_path, save_log_dir, log_file_name):
+    REPORT_HEADERS = {
+        'X-Requested-With': 'XMLHttpRequest',
+        'X-FineUI-Ajax': 'true'
+    }
+
+    def __init__(self, setting_config_path, person_config_path, save_log_dir, log_file_name, benchmark=False,
+                 stage_timer=None, shard=None, cassette=None):
         """
         Initialize the class named SelfReport.
         :param setting_config_path: path of setting_config.yaml
         :param person_config_path: path of person_config.yaml
         :param save_log_dir: directory where logs are stored
         :log_file_name: the name prefix of the log file
+        :param benchmark: whether to skip the random sleeps between accounts
+        :param stage_timer: StageTimer which collects the duration of every
+        stage of "selfreport", None to use Metrics if enabled in
+        setting_config.yaml
+        :param shard: (index, count) to report only the shard "index" of the
+        accounts partitioned into "count" shards, None to report all accounts
+        :param cassette: Cassette which records the requests of every account,
+        or replays them without the network, in which case the rate limiter,
+        the circuit breaker and all sleeps are skipped. The session cache is
+        not used with a cassette, so that every report logs in
         """
         def path_check(path):
             path_obj = Path(path)
@@ -34,15 +70,14 @@ class SelfReport(object):
                 print("Error: {} is not a file path!".format(path))
                 exit(1)
 
-        def setup_log(log_dir, log_name):
+        def setup_log(log_dir, log_name, log_format="%(levelname)s %(asctime)s %(message)s"):
             res = logging.getLogger(log_name)
             log_path = os.path.join(log_dir, log_name)
             res.setLevel(logging.INFO)
-            file_handler = TimedRotatingFileHandler(filename=log_path, when="MIDNIGHT", interval=1, backupCount=30)
-            file_handler.suffix = "%Y-%m-%d.log"
-            file_handler.extMatch = re.compile(r"^\d{4}-\d{2}-\d{2}.log$")
-            file_handler.setFormatter(logging.Formatter("%(levelname)s %(asctime)s %(message)s"))
-            res.addHandler(file_handler)
+            res.propagate = False
+            file_handler = BatchFileHandler(log_path, 30, self.setting_config.log.compress)
+            file_handler.setFormatter(logging.Formatter(log_format))
+            self.log_writer.add(res, file_handler)
             return res
 
         path_check(setting_config_path)
@@ -50,16 +85,56 @@ class SelfReport(object):
 
         self.setting_config_path = setting_config_path
         self.person_config_path = person_config_path
+        self.roster = Roster(person_config_path)
 
+        self.shard = None
         self.setting_config = self.__load_setting_config()
+        if shard is not None:
+            shard_config = self.setting_config.shard
+            self.shard = ShardLease(shard_config.lease_dir, shard[0], shard[1], shard_config.lease_ttl)
+            self.setting_config = self.__get_shard_config(self.setting_config)
+
+        self.f_state_template = FStateTemplate(os.path.join(os.path.dirname(__file__), 'f_state.json'))
+        self.view_state_extractor = ViewStateExtractor(self.setting_config.report.view_state_parser)
+        self.rate_limiter = RateLimiter(self.setting_config.concurrency.rate_limit)
+
+        job_store_config = self.setting_config.job_store
+        self.job_store = JobStore(job_store_config.path, job_store_config.keep_days) \
+            if job_store_config.enable else None
+
+        session_cache_config = self.setting_config.session_cache
+        self.session_cache = SessionCache(session_cache_config.path, session_cache_config.max_age) \
+            if session_cache_config.enable and cassette is None else None
 
         if not os.path.exists(save_log_dir):
             os.makedirs(save_log_dir)
 
         self.save_log_dir = save_log_dir
-        self.log_file_name = log_file_name
+        self.log_base_name = log_file_name
+        self.log_file_name = log_file_name if self.shard is None else "{}_{}".format(log_file_name, self.shard.name)
+
+        self.log_writer = LogWriter(self.setting_config.log.flush_interval)
+        self.logger = setup_log(save_log_dir, self.log_file_name)
+        self.setting_config = self.__check_transport(self.setting_config)
+
+        self.cassette = cassette
+        self.benchmark = benchmark or (cassette is not None and cassette.is_replay)
 
-        self.logger = setup_log(save_log_dir, log_file_name)
+        self.retry_policy = self.__get_retry_policy()
+        self.circuit_breaker = self.__get_circuit_breaker()
+
+        metrics_config = self.setting_config.metrics
+        if stage_timer is None and metrics_config.enable:
+            json_logger = setup_log(save_log_dir, self.log_file_name + "_metrics", "%(message)s") \
+                if metrics_config.json_log else None
+            stage_timer = Metrics(json_logger)
+            if metrics_config.port:
+                stage_timer.serve(metrics_config.host, metrics_config.port)
+        self.stage_timer = stage_timer
+
+        self.mail_dispatcher = MailDispatcher(self.logger, self.setting_config.email.connections,
+                                              self.setting_config.email.idle_timeout, self.retry_policy,
+                                              self.circuit_breaker, stage_timer)
 
     def test_send_email(self, email_to):
         """
@@ -69,29 +144,30 @@ class SelfReport(object):
         """
         subject = "发送模块测试邮件"
         message = "配置文件中的email模块设置正常。\n<br/>"
-        if self.setting_config['report']['send_email']:
+        if self.setting_config.report.send_email:
             message += "主人您现在的设置已经开启邮件提醒功能，程序将会在每日一报后通过邮件告诉主人您！"
         else:
             message += "主人您还没有开启发送每日一报报送状态的邮件提醒功能，如果需要，只需将report中的send_email选项设为true即可。感谢主人的使用！"
         self.__send_mail(email_to, subject, message)
+        self.mail_dispatcher.join()
         exit(0)
 
     def test_all_accounts(self):
         """
         Test whether all accounts in setting_config.yaml are correct. When
-        testing, each account has an interval of 30-60 seconds.
+        testing one by one, each account has an interval of 10-20 seconds
+        unless in benchmark mode.
         :return: no return
         """
         t = self.__get_time()
 
-        person_config = self.__load_config(self.person_config_path)
+        person_config = self.roster.reload()
+        if self.shard is not None:
+            person_config = [person_info for person_info in person_config if self.shard.owns(person_info.id)]
 
-        for person_info in person_config:
-            is_successful = self.__report(t, person_info)
+        for person_info, is_successful in self.__report_all(t, person_config, (10, 20)):
             print("{} {} {}".format(person_info['id'], self.__get_report_name(t), self.__get_status(is_successful)))
 
-            time.sleep(int(random.uniform(10, 20)))
-
         exit(0)
 
     def test_single_account(self, account):
@@ -103,103 +179,263 @@ class SelfReport(object):
         """
         t = self.__get_time()
 
-        person_config = self.__load_config(self.person_config_path)
-
-        for person_info in person_config:
-            if account != person_info['id']:
-                continue
+        person_info = self.roster.reload().get(account)
 
+        if person_info is not None:
             is_successful = self.__report(t, person_info)
             print("{} {} {}".format(person_info['id'], self.__get_report_name(t), self.__get_status(is_successful)))
 
-            break
+            if self.session_cache is not None:
+                self.session_cache.flush()
 
         exit(0)
 
+    def validate_accounts(self, report_path=None, workers=None):
+        """
+        Check that every account can log in, without submitting the report. The
+        accounts are checked concurrently, and their requests still go through
+        the rate limiter and the circuit breaker, so that a large roster can be
+        validated quickly without flooding the server. Unlike the other tests
+        it does not exit, so that it can be called by other programs.
+        :param report_path: path of the report, CSV if it ends with .csv,
+        otherwise JSON, None to save no report
+        :param workers: number of accounts checked at the same time, None for
+        the workers of concurrency in setting_config.yaml
+        :return: ValidationReport
+        """
+        t = self.__get_time()
+        url = self.__get_report_url(t)
+        workers = workers or self.setting_config.concurrency.workers
+
+        person_config = self.roster.reload()
+        if self.shard is not None:
+            person_config = [person_info for person_info in person_config if self.shard.owns(person_info.id)]
+
+        report = ValidationReport(t)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = set()
+            for person_info in person_config:
+                if len(futures) >= workers * 2:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report.add(future.result())
+                futures.add(executor.submit(self.__validate, url, person_info))
+            for future in as_completed(futures):
+                report.add(future.result())
+
+        if report_path is not None:
+            report.save(report_path)
+        return report
+
     def auto_report(self):
         """
-        Automatically complete "selfreport".
+        Automatically complete "selfreport". Sleep until the next report or the
+        manager email is due. Changes to setting_config.yaml take effect as soon
+        as they are noticed.
         :return: no return
         """
+        scheduler_config = self.setting_config.scheduler
+        scheduler = Scheduler(self.__get_time, scheduler_config.state_path, scheduler_config.catch_up_minutes,
+                              self.logger)
+        self.__add_jobs(scheduler)
+        if scheduler_config.reload_interval:
+            ConfigWatcher(self.setting_config_path, scheduler_config.reload_interval,
+                          lambda: self.__reload_setting_config(scheduler)).start()
+        scheduler.run()
 
-        while True:
-            t = self.__get_time()
-
-            if t.hour == 0 and t.minute == 0:
-                self.setting_config = self.__load_setting_config()
+    def __add_jobs(self, scheduler):
+        """
+        Add the daily jobs according to setting_config.yaml.
+        :param scheduler: Scheduler
+        :return: no return
+        """
+        actions = {'morning': self.__report_window, 'night': self.__report_window, 'manager': self.__send_log_email}
+        for name, hour, minute in self.setting_config.schedule:
+            if name == 'manager' and self.shard is not None and self.shard.index != 0:
+                continue
+            scheduler.add_daily_job(name, hour, minute, actions[name])
 
-            if (t.hour == self.setting_config['report']['morning_hour'] and
-                t.minute in [self.setting_config['report']['morning_minute'],
-                             self.setting_config['report']['morning_minute'] + 1]) or (
-                    t.hour == self.setting_config['report']['night_hour'] and
-                    t.minute in [self.setting_config['report']['night_minute'],
-                                 self.setting_config['report']['night_minute'] + 1]):
+    def __reload_setting_config(self, scheduler):
+        """
+        Reload setting_config.yaml after it has changed, swap in the new config
+        and reschedule the jobs. The old config is kept if the new one cannot be
+        loaded. Job store, session cache, metrics, logs, the number of email
+        connections and the lease directory of the shards keep their settings
+        until restarted.
+        :param scheduler: Scheduler
+        :return: no return
+        """
+        try:
+            setting_config = self.__check_transport(self.__load_setting_config())
+        except Exception as e:
+            self.logger.error("重新加载配置 失败 {}".format(e))
+            return
 
-                person_config = self.__load_config(self.person_config_path)
+        old_config, self.setting_config = self.setting_config, setting_config
+        self.view_state_extractor = ViewStateExtractor(setting_config.report.view_state_parser)
+        self.rate_limiter = RateLimiter(setting_config.concurrency.rate_limit)
+        self.retry_policy = self.mail_dispatcher.retry_policy = self.__get_retry_policy()
+        # rebuilding the circuit breaker forgets which servers are paused, so only do it if its settings changed
+        if setting_config.circuit_breaker != old_config.circuit_breaker:
+            self.circuit_breaker = self.mail_dispatcher.circuit_breaker = self.__get_circuit_breaker()
+        self.mail_dispatcher.idle_timeout = setting_config.email.idle_timeout
+        if self.shard is not None:
+            self.shard.ttl = setting_config.shard.lease_ttl
 
-                for person_info in person_config:
-                    is_successful = self.__report(t, person_info)
+        def reschedule():
+            scheduler.clear()
+            self.__add_jobs(scheduler)
 
-                    self.__send_report_email(is_successful, person_info['email_to'], t)
+        scheduler.call_soon(reschedule)
+        self.logger.info("重新加载配置 成功 {}".format(self.setting_config_path))
 
-                    time.sleep(int(random.uniform(30, 60)))
+    def __report_window(self, t):
+        """
+        Complete "selfreport" of all accounts for the report due at "t".
+        :param t: time the report was due
+        :return: no return
+        """
+        person_config = self.roster.reload()
+        spread = self.setting_config.scheduler.spread_minutes * 60
 
-                time.sleep(60)
+        day, slot = t.strftime('%Y-%m-%d'), self.__get_slot(t)
+        if self.shard is not None:
+            if not self.shard.acquire(day, slot, poll=min(60.0, self.shard.ttl / 10)):
+                if self.shard.is_finished(day, slot):
+                    self.logger.info("{} 分片{}已报送完成".format(self.__get_report_name(t), self.shard.name))
+                else:
+                    self.logger.info("{} 分片{}已由其他进程报送".format(self.__get_report_name(t), self.shard.name))
+                return
+            person_config = [person_info for person_info in person_config if self.shard.owns(person_info.id)]
 
-            if self.setting_config['manager']['send_email']:
-                if (t.hour == self.setting_config['manager']['hour'] and
-                        t.minute in [self.setting_config['manager']['minute'],
-                                     self.setting_config['manager']['minute'] + 1]):
-                    self.__send_mail(self.setting_config['manager']['email_to'], "{}月{}日 日志".format(t.month, t.day),
-                                     self.__read_file_as_str(self.__get_log_file_path()))
+        job_key = None
+        if self.job_store is not None:
+            job_key = (day, slot)
+            claimed = self.job_store.claim(day, slot, [person_info.id for person_info in person_config])
+            skipped = [person_info.id for person_info in person_config if person_info.id not in claimed]
+            if skipped:
+                counts = self.job_store.count(day, slot, skipped)
+                self.logger.info("{} 跳过已完成 {} 其他进程报送中 {}".format(
+                    self.__get_report_name(t), counts.get(JobStore.DONE, 0), counts.get(JobStore.IN_FLIGHT, 0)))
+            person_config = [person_info for person_info in person_config if person_info.id in claimed]
 
-                    time.sleep(60)
+        with self.shard.hold(day, slot) if self.shard is not None else nullcontext():
+            for person_info, is_successful in self.__report_all(t, person_config, (30, 60), spread, job_key):
+                if is_successful is None:
+                    continue
+                if self.job_store is not None:
+                    self.job_store.finish(day, slot, person_info['id'], is_successful)
+                self.__send_report_email(is_successful, person_info['email_to'], t)
 
-            time.sleep(60)
+        if self.shard is not None:
+            self.shard.finish(day, slot)
 
-    def __load_setting_config(self):
+    def __send_log_email(self, t):
         """
-        Load setting_config.yaml, and automatically correct errors after loading.
+        Send the log of the day to the manager, as a digest of the results and
+        failures with the full log compressed as an attachment, or as the full
+        log if the digest is disabled. When sharded, the logs of all shards are
+        sent together by shard 0.
+        :param t: time the email was due
         :return: no return
         """
-        setting_config = self.__load_config(self.setting_config_path)
-
-        if (not setting_config['email']['from'] or not setting_config['email']['username'] or
-                not setting_config['email']['password'] or not setting_config['email']['smtp'] or
-                not setting_config['email']['port']):
-            setting_config['report']['send_email'] = False
-
-        if setting_config['report']['morning_hour'] < 6 or setting_config['report']['morning_hour'] > 20:
-            setting_config['report']['morning_hour'] = 7
-        if setting_config['report']['morning_minute'] < 0 or setting_config['report']['morning_minute'] >= 60:
-            setting_config['report']['morning_minute'] = 30
-        if setting_config['report']['night_hour'] < 19 or setting_config['report']['night_hour'] > 23:
-            setting_config['report']['night_hour'] = 20
-        if setting_config['report']['night_minute'] < 0 or setting_config['report']['night_minute'] >= 60:
-            setting_config['report']['night_minute'] = 30
-
-        if setting_config['report']['temperature'] < 35 or setting_config['report']['temperature'] >= 37.3:
-            setting_config['report']['temperature'] = 36.5
-
-        if setting_config['manager']['send_email']:
-            if not setting_config['manager']['email_to']:
-                setting_config['manager']['send_email'] = False
-            if setting_config['manager']['hour'] < 0 or setting_config['manager']['hour'] > 23:
-                setting_config['manager']['hour'] = 22
-            if setting_config['manager']['minute'] < 0 or setting_config['manager']['minute'] >= 60:
-                setting_config['manager']['minute'] = 30
+        manager_config = self.setting_config.manager
+        subject = "{}月{}日 日志".format(t.month, t.day)
+        self.log_writer.flush()
+        if self.shard is None:
+            logs = [(None, self.log_file_name)]
+        else:
+            logs = [(name, "{}_{}".format(self.log_base_name, name))
+                    for name in ("{}of{}".format(i, self.shard.count) for i in range(self.shard.count))]
+
+        if not manager_config.digest:
+            if self.shard is None:
+                message = self.__read_file_as_str(self.__get_log_file_path())
+            else:
+                message = "\n".join("分片{}\n{}".format(label, self.__read_file_as_str(
+                    os.path.join(self.save_log_dir, log_name))) for label, log_name in logs)
+            self.__send_mail(manager_config.email_to, subject, message)
+            return
+
+        digest = LogDigest(manager_config.max_failures)
+        attachments = []
+        too_large = []
+        for label, log_name in logs:
+            log_path = os.path.join(self.save_log_dir, log_name)
+            digest.add_file(log_path, label)
+            if manager_config.attach_log:
+                data = LogDigest.compress(log_path, manager_config.max_attachment_kb * 1024)
+                if data is not None:
+                    attachments.append((log_name + '.log.gz', data))
+                elif os.path.exists(log_path):
+                    too_large.append(log_name)
 
+        message = digest.render(subject)
+        if too_large:
+            message += "\n\n日志压缩后超过{}KB，未附上：{}".format(manager_config.max_attachment_kb,
+                                                           '，'.join(too_large))
+        self.__send_mail(manager_config.email_to, subject, message, attachments)
+
+    def __load_setting_config(self):
+        """
+        Load and validate setting_config.yaml.
+        :return: SettingConfig
+        """
+        setting_config = SettingConfig.load(self.setting_config_path)
+        if self.shard is not None:
+            setting_config = self.__get_shard_config(setting_config)
         return setting_config
 
-    @staticmethod
-    def __load_config(config_path):
+    def __check_transport(self, setting_config):
         """
-        Load configuration file.
-        :param config_path: the path of the configuration file
-        :return: configuration parameters
+        Fall back to the requests transport if the aiohttp transport is set but
+        aiohttp is not installed, rather than failing at the first report.
+        :param setting_config: SettingConfig
+        :return: SettingConfig with a transport which can be used
         """
-        with open(config_path, encoding='utf8') as f:
-            return yaml.load(f, Loader=yaml.FullLoader)
+        if setting_config.transport.backend != 'aiohttp' or AsyncTransport.is_available():
+            return setting_config
+        self.logger.error("aiohttp 未安装，改用requests报送，可使用pip install aiohttp安装")
+        return replace(setting_config, transport=replace(setting_config.transport, backend='requests'))
+
+    def __get_shard_config(self, setting_config):
+        """
+        Give the state files of this shard their own names, and the metrics
+        their own port, as the processes of the other shards may run on the same
+        machine.
+        :param setting_config: SettingConfig
+        :return: SettingConfig of this shard
+        """
+        metrics_config = setting_config.metrics
+        return replace(
+            setting_config,
+            job_store=replace(setting_config.job_store, path=self.__get_shard_path(setting_config.job_store.path)),
+            session_cache=replace(setting_config.session_cache,
+                                  path=self.__get_shard_path(setting_config.session_cache.path)),
+            scheduler=replace(setting_config.scheduler,
+                              state_path=self.__get_shard_path(setting_config.scheduler.state_path)),
+            metrics=replace(metrics_config, port=metrics_config.port + self.shard.index if metrics_config.port else 0))
+
+    def __get_circuit_breaker(self):
+        """
+        Build the circuit breaker of setting_config.yaml.
+        :return: CircuitBreaker
+        """
+        breaker_config = self.setting_config.circuit_breaker
+        return CircuitBreaker(breaker_config.window, breaker_config.failure_rate, breaker_config.min_requests,
+                              breaker_config.pause, self.logger)
+
+    def __get_retry_policy(self):
+        """
+        Build the retry policy of setting_config.yaml, which retries without
+        waiting when replaying.
+        :return: RetryPolicy
+        """
+        retry_config = self.setting_config.retry
+        if self.cassette is not None and self.cassette.is_replay:
+            return RetryPolicy(retry_config.max_retries, 0, 0, 0, retry_config.rules)
+        return RetryPolicy(retry_config.max_retries, retry_config.base_delay, retry_config.max_delay,
+                           retry_config.jitter, retry_config.rules)
 
     @staticmethod
     def __get_time():
@@ -211,67 +447,296 @@ class SelfReport(object):
         t = t + dt.timedelta(hours=8)
         return t
 
-    def __report(self, t, person_info):
+    def __report_all(self, t, person_config, interval, spread=0, job_key=None):
+        """
+        Complete "selfreport" for every account. With one worker the accounts
+        are reported one by one, otherwise they are reported concurrently by a
+        bounded pool of workers, which takes accounts from "person_config"
+        lazily so that only a few are queued at a time. With the aiohttp
+        transport the accounts are reported by coroutines instead of workers.
+        :param t: time
+        :param person_config: iterable of the Personal information of all accounts
+        :param interval: (min, max) seconds to sleep between two accounts when
+        reporting one by one without spreading
+        :param spread: seconds after "t" over which the accounts are spread, each
+        account starts at a fixed offset derived from its id, 0 for no spreading
+        :param job_key: (day, slot) of the claimed jobs in the job store, which
+        are started as their reports start, None if not tracked
+        :return: generator of (person_info, the status of "selfreport"), the
+        status is None if the job was started by another process
+        """
+        workers = self.setting_config.concurrency.workers
+
+        if self.benchmark:
+            spread = 0
+
+        if spread:
+            person_config = sorted(person_config, key=lambda p: self.__get_offset(p['id'], spread))
+
+        try:
+            if self.setting_config.transport.backend == 'aiohttp':
+                yield from self.__report_all_async(t, person_config, spread, job_key)
+                return
+
+            if workers == 1:
+                for i, person_info in enumerate(person_config):
+                    if spread:
+                        self.__sleep_until(t + dt.timedelta(seconds=self.__get_offset(person_info['id'], spread)))
+                    elif i > 0 and not self.benchmark:
+                        time.sleep(int(random.uniform(*interval)))
+                    yield person_info, self.__report(t, person_info, job_key)
+                return
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {}
+                for person_info in person_config:
+                    start = t + dt.timedelta(seconds=self.__get_offset(person_info['id'], spread)) if spread else None
+                    while futures and (len(futures) >= workers * 2 or
+                                       (start is not None and self.__get_time() < start)):
+                        timeout = None if len(futures) >= workers * 2 else \
+                            max(0.0, (start - self.__get_time()).total_seconds())
+                        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield self.__get_result(futures.pop(future), future)
+                    if start is not None:
+                        self.__sleep_until(start)
+                    futures[executor.submit(self.__report, t, person_info, job_key)] = person_info
+
+                for future in as_completed(futures):
+                    yield self.__get_result(futures[future], future)
+        finally:
+            if self.session_cache is not None:
+                self.session_cache.flush()
+
+    def __report_all_async(self, t, person_config, spread, job_key=None):
+        """
+        Complete "selfreport" for every account with coroutines sharing one
+        connection pool. The event loop runs in its own thread and hands the
+        results over through a queue, so that they can be yielded as they come.
+        :param t: time
+        :param person_config: iterable of the Personal information of all accounts,
+        sorted by offset if spread
+        :param spread: seconds after "t" over which the accounts are spread
+        :param job_key: (day, slot) of the claimed jobs in the job store, None if
+        not tracked
+        :return: generator of (person_info, the status of "selfreport")
+        """
+        transport_config = self.setting_config.transport
+        results = queue.Queue()
+        done = object()
+
+        async def report(transport, semaphore, person_info):
+            try:
+                is_successful = await self.__report_async(t, person_info, transport, job_key)
+            except Exception as e:
+                self.logger.error("报送 异常 {} {}".format(person_info['id'], e))
+                is_successful = False
+            finally:
+                semaphore.release()
+            results.put((person_info, is_successful))
+
+        async def report_all():
+            async with AsyncTransport(transport_config.pool_size, transport_config.timeout) as transport:
+                semaphore = asyncio.Semaphore(transport_config.max_in_flight)
+                tasks = set()
+                for person_info in person_config:
+                    if spread:
+                        start = t + dt.timedelta(seconds=self.__get_offset(person_info['id'], spread))
+                        await asyncio.sleep(max(0.0, (start - self.__get_time()).total_seconds()))
+                    await semaphore.acquire()
+                    task = asyncio.ensure_future(report(transport, semaphore, person_info))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                if tasks:
+                    await asyncio.wait(tasks)
+
+        def run():
+            try:
+                asyncio.run(report_all())
+            except Exception as e:
+                results.put(e)
+            finally:
+                results.put(done)
+
+        thread = threading.Thread(target=run, name='report', daemon=True)
+        thread.start()
+        while True:
+            result = results.get()
+            if result is done:
+                break
+            if isinstance(result, Exception):
+                raise result
+            yield result
+        thread.join()
+
+    def __get_result(self, person_info, future):
+        """
+        Get the status of "selfreport" from a finished worker.
+        :param person_info: Personal information of the account
+        :param future: the finished future of __report
+        :return: (person_info, the status of "selfreport")
+        """
+        try:
+            return person_info, future.result()
+        except Exception as e:
+            self.logger.error("报送 异常 {} {}".format(person_info['id'], e))
+            return person_info, False
+
+    @staticmethod
+    def __get_slot(t):
+        """
+        Get the slot "t" of the report in the url of "selfreport".
+        :param t: time
+        :return: 1 for the morning report, 2 for the night report
+        """
+        return 1 if t.hour < 19 else 2
+
+    @staticmethod
+    def __get_offset(account, spread):
+        """
+        Get the fixed offset of an account within the spread of a report.
+        :param account: account id
+        :param spread: seconds over which the accounts are spread
+        :return: offset in seconds
+        """
+        return zlib.crc32(str(account).encode('utf-8')) % spread
+
+    def __get_shard_path(self, path):
+        """
+        Get the path of a state file of this shard.
+        :param path: path of the state file of the unsharded program
+        :return: path with the name of the shard, e.g. state/scheduler_0of4.json
+        """
+        root, ext = os.path.splitext(path)
+        return "{}_{}{}".format(root, self.shard.name, ext)
+
+    def __sleep_until(self, t):
+        """
+        Sleep until time "t".
+        :param t: time
+        :return: no return
+        """
+        delay = (t - self.__get_time()).total_seconds()
+        if delay > 0:
+            time.sleep(delay)
+
+    def __report(self, t, person_info, job_key=None):
         """
         Basic module: complete "Report of the Day" through user
         account and password
         :param t:time
         :param person_info: Personal information read from configuration file
+        :param job_key: (day, slot) of the job in the job store, which is marked
+        as in flight before reporting, None if not tracked
+        :return: the status of "selfreport", None if the job was started by
+        another process
+        """
+        if not self.__start_job(job_key, person_info['id']):
+            return None
+        with self.__stage('report', person_info['id']) as stage, self.__use_cassette(person_info['id']):
+            stage['ok'] = self.__submit_report(t, person_info)
+        return stage['ok']
+
+    def __start_job(self, job_key, account):
+        """
+        Mark the job of an account as in flight in the job store.
+        :param job_key: (day, slot) of the job, None if not tracked
+        :param account: account id
+        :return: whether the account is to be reported
+        """
+        if job_key is None:
+            return True
+        if self.job_store.start(*job_key, account):
+            return True
+        self.logger.info("跳过 {} 已由其他进程报送".format(account))
+        return False
+
+    def __submit_report(self, t, person_info):
+        """
+        Log in if the cached session is dead, get the page and submit the report.
+        :param t:time
+        :param person_info: Personal information read from configuration file
         :return: the status of "selfreport"
         """
-        ii = '1' if t.hour < 19 else '2'
+        url = self.__get_report_url(t)
 
         sess = requests.Session()
+        view_state = None
 
-        retry_time = 5
-        while True:
-            try:
-                r = sess.get('https://selfreport.shu.edu.cn/Default.aspx')
-                sess.post(r.url, data={
-                    'username': person_info['id'],
-                    'password': person_info['pwd']
-                })
-                sess.get(
-                    'https://newsso.shu.edu.cn/oauth/authorize?response_type=code&client_id=WUHWfrntnWYHZfzQ5QvXUCVy'
-                    '&redirect_uri=https%3a%2f%2fselfreport.shu.edu.cn%2fLoginSSO.aspx%3fReturnUrl%3d%252fDefault'
-                    '.aspx&scope=1')
-            except Exception as e:
-                if retry_time > 0:
-                    retry_time -= 1
-                    continue
-                self.logger.error("登录1 失败 {}".format(person_info['id']))
+        if self.session_cache is not None and self.session_cache.load(person_info['id'], sess):
+            with self.__stage('page', person_info['id']) as stage:
+                r = self.__get_page(sess, url, stage)
+            if r is None:
                 return False
-            break
+            with self.__stage('parse', person_info['id']) as stage:
+                view_state = self.view_state_extractor.extract(r.text)
+                stage['ok'] = view_state is not None
+            if view_state is None:
+                self.session_cache.remove(person_info['id'])
+                sess = requests.Session()
 
-        url = f'https://selfreport.shu.edu.cn/XueSFX/HalfdayReport.aspx?day={t.year}-{t.month}-{t.day}&t={ii}'
+        if view_state is None:
+            with self.__stage('login', person_info['id']) as stage:
+                is_logged_in = self.__login(sess, person_info, stage)
+            if not is_logged_in:
+                return False
 
-        retry_time = 5
-        while True:
-            try:
-                r = sess.get(url)
-            except Exception:
-                if retry_time > 0:
-                    retry_time -= 1
-                    continue
-                self.logger.error("网页获取 失败 {}".format(url))
+            with self.__stage('page', person_info['id']) as stage:
+                r = self.__get_page(sess, url, stage)
+            if r is None:
+                return False
+            with self.__stage('parse', person_info['id']) as stage:
+                view_state = self.view_state_extractor.extract(r.text)
+                stage['ok'] = view_state is not None
+
+            if view_state is None:
+                self.logger.error("登录2 失败 {}".format(person_info['id']))
                 return False
-            break
 
-        soup = BeautifulSoup(r.text, 'html.parser')
-        view_state = soup.find('input', attrs={'name': '__VIEWSTATE'})
+            if self.session_cache is not None:
+                self.session_cache.save(person_info['id'], sess)
 
-        if view_state is None:
-            self.logger.error("登录2 失败 {}".format(person_info['id']))
+        with self.__stage('submit', person_info['id']) as stage:
+            r = self.__submit(sess, url, stage, data=self.__get_form(t, person_info, view_state),
+                              headers=self.REPORT_HEADERS, allow_redirects=False)
+            stage['ok'] = r is not None and '提交成功' in r.text
+
+        if stage['ok']:
+            self.logger.info("{} 成功 {}".format(self.__get_report_name(t), person_info['id']))
+            return True
+        else:
+            self.logger.info("{} 失败 {}".format(self.__get_report_name(t), person_info['id']))
             return False
 
-        temperature = self.setting_config['report']['temperature']
-        temperature = str(round(random.uniform(temperature - 0.2, temperature + 0.2), 1))
-        f_state = '''{"p1_BaoSRQ":{"Text":"%s"},"p1_DangQSTZK":{"F_Items":[["良好","良好",1],["不适","不适",1]],"SelectedValue":"良好"},"p1_ZhengZhuang":{"Hidden":true,"F_Items":[["感冒","感冒",1],["咳嗽","咳嗽",1],["发热","发热",1]],"SelectedValueArray":[]},"p1_TiWen":{"Text":"%s"},"p1_ZaiXiao":{"SelectedValue":"%s","F_Items":[["不在校","不在校",1],["宝山","宝山校区",1],["延长","延长校区",1],["嘉定","嘉定校区",1],["新闸路","新闸路校区",1]]},"p1_ddlSheng":{"F_Items":[["-1","选择省份",1,"",""],["北京","北京",1,"",""],["天津","天津",1,"",""],["上海","上海",1,"",""],["重庆","重庆",1,"",""],["河北","河北",1,"",""],["山西","山西",1,"",""],["辽宁","辽宁",1,"",""],["吉林","吉林",1,"",""],["黑龙江","黑龙江",1,"",""],["江苏","江苏",1,"",""],["浙江","浙江",1,"",""],["安徽","安徽",1,"",""],["福建","福建",1,"",""],["江西","江西",1,"",""],["山东","山东",1,"",""],["河南","河南",1,"",""],["湖北","湖北",1,"",""],["湖南","湖南",1,"",""],["广东","广东",1,"",""],["海南","海南",1,"",""],["四川","四川",1,"",""],["贵州","贵州",1,"",""],["云南","云南",1,"",""],["陕西","陕西",1,"",""],["甘肃","甘肃",1,"",""],["青海","青海",1,"",""],["内蒙古","内蒙古",1,"",""],["广西","广西",1,"",""],["西藏","西藏",1,"",""],["宁夏","宁夏",1,"",""],["新疆","新疆",1,"",""],["香港","香港",1,"",""],["澳门","澳门",1,"",""],["台湾","台湾",1,"",""]],"SelectedValueArray":["%s"]},"p1_ddlShi":{"Enabled":true,"F_Items":[["-1","选择市",1,"",""],["上海市","上海市",1,"",""]],"SelectedValueArray":["%s"]},"p1_ddlXian":{"Enabled":true,"F_Items":[["-1","选择县区",1,"",""],["黄浦区","黄浦区",1,"",""],["卢湾区","卢湾区",1,"",""],["徐汇区","徐汇区",1,"",""],["长宁区","长宁区",1,"",""],["静安区","静安区",1,"",""],["普陀区","普陀区",1,"",""],["虹口区","虹口区",1,"",""],["杨浦区","杨浦区",1,"",""],["宝山区","宝山区",1,"",""],["闵行区","闵行区",1,"",""],["嘉定区","嘉定区",1,"",""],["松江区","松江区",1,"",""],["金山区","金山区",1,"",""],["青浦区","青浦区",1,"",""],["奉贤区","奉贤区",1,"",""],["浦东新区","浦东新区",1,"",""],["崇明区","崇明区",1,"",""]],"SelectedValueArray":["%s"]},"p1_FengXDQDL":{"SelectedValue":"否","F_Items":[["是","是",1],["否","否",1]]},"p1_TongZWDLH":{"SelectedValue":"否","F_Items":[["是","是",1],["否","否",1]]},"p1_XiangXDZ":{"Text":"%s"},"p1_QueZHZJC":{"F_Items":[["是","是",1,"",""],["否","否",1,"",""]],"SelectedValueArray":["否"]},"p1_DangRGL":{"SelectedValue":"否","F_Items":[["是","是",1],["否","否",1]]},"p1_GeLSM":{"Hidden":true,"IFrameAttributes":{}},"p1_GeLFS":{"Required":false,"Hidden":true,"F_Items":[["居家隔离","居家隔离",1],["集中隔离","集中隔离",1]],"SelectedValue":null},"p1_GeLDZ":{"Hidden":true},"p1_CengFWH":{"Label":"2020年9月27日后是否在中高风险地区逗留过<span style='color:red;'>（天津东疆港区瞰海轩小区、天津汉沽街、天津中心渔港冷链物流区A区和B区、浦东营前村、安徽省阜阳市颍上县慎城镇张洋小区、浦东周浦镇明天华城小区、浦东祝桥镇新生小区、内蒙古满洲里东山街道办事处、内蒙古满洲里北区街道）</span>","F_Items":[["是","是",1],["否","否",1]],"SelectedValue":"否"},"p1_CengFWH_RiQi":{"Hidden":true},"p1_CengFWH_BeiZhu":{"Hidden":true},"p1_JieChu":{"Label":"11月08日至11月22日是否与来自中高风险地区发热人员密切接触<span style='color:red;'>（天津东疆港区瞰海轩小区、天津汉沽街、天津中心渔港冷链物流区A区和B区、浦东营前村、安徽省阜阳市颍上县慎城镇张洋小区、浦东周浦镇明天华城小区、浦东祝桥镇新生小区、内蒙古满洲里东山街道办事处、内蒙古满洲里北区街道）</span>","SelectedValue":"否","F_Items":[["是","是",1],["否","否",1]]},"p1_JieChu_RiQi":{"Hidden":true},"p1_JieChu_BeiZhu":{"Hidden":true},"p1_TuJWH":{"Label":"11月08日至11月22日是否乘坐公共交通途径中高风险地区<span style='color:red;'>（天津东疆港区瞰海轩小区、天津汉沽街、天津中心渔港冷链物流区A区和B区、浦东营前村、安徽省阜阳市颍上县慎城镇张洋小区、浦东周浦镇明天华城小区、浦东祝桥镇新生小区、内蒙古满洲里东山街道办事处、内蒙古满洲里北区街道）</span>","SelectedValue":"否","F_Items":[["是","是",1],["否","否",1]]},"p1_TuJWH_RiQi":{"Hidden":true},"p1_TuJWH_BeiZhu":{"Hidden":true},"p1_JiaRen":{"Label":"11月08日至11月22日家人是否有发热等症状"},"p1_JiaRen_BeiZhu":{"Hidden":true},"p1_SuiSM":{"SelectedValue":"绿色","F_Items":[["红色","红色",1],["黄色","黄色",1],["绿色","绿色",1]]},"p1_LvMa14Days":{"SelectedValue":"是","F_Items":[["是","是",1],["否","否",1]]},"p1":{"Title":"每日两报（%s）","IFrameAttributes":{}}}''' % (t.strftime('%Y-%m-%d'), temperature, person_info['campus'], '上海', '上海市', person_info['county'], person_info['address'], self.__get_report_name(t))
-        f_state = base64.b64encode(bytes(f_state, encoding='utf-8'))
-        r = sess.post(url, data={
+    def __get_report_url(self, t):
+        """
+        Get the url of the page of "selfreport".
+        :param t: time
+        :return: url
+        """
+        return '{}/XueSFX/HalfdayReport.aspx?day={}-{}-{}&t={}'.format(
+            self.setting_config.server.selfreport_url, t.year, t.month, t.day, self.__get_slot(t))
+
+    def __get_form(self, t, person_info, view_state):
+        """
+        Fill in the form of "selfreport".
+        :param t: time
+        :param person_info: Personal information read from configuration file
+        :param view_state: __VIEWSTATE of the page
+        :return: dict of the form
+        """
+        with self.__stage('payload', person_info['id']):
+            temperature = self.setting_config.report.temperature
+            temperature = str(round(random.uniform(temperature - 0.2, temperature + 0.2), 1))
+            f_state = self.f_state_template.render({'title': self.__get_report_name(t)},
+                                                   date=t.strftime('%Y-%m-%d'), temperature=temperature,
+                                                   campus=person_info['campus'], county=person_info['county'],
+                                                   address=person_info['address'])
+
+        return {
             '__EVENTTARGET': 'p1$ctl00$btnSubmit',
             '__EVENTARGUMENT': '',
-            '__VIEWSTATE': view_state['value'],
+            '__VIEWSTATE': view_state,
             '__VIEWSTATEGENERATOR': 'DC4D08A3',
             'p1$ChengNuo': 'p1_ChengNuo',
             'p1$BaoSRQ': t.strftime('%Y-%m-%d'),
@@ -308,18 +773,350 @@ class SelfReport(object):
             'p1_GeLSM_Collapsed': 'false',
             'p1_Collapsed': 'false',
             'F_STATE': f_state
-        }, headers={
-            'X-Requested-With': 'XMLHttpRequest',
-            'X-FineUI-Ajax': 'true'
-        }, allow_redirects=False)
+        }
+
+    def __stage(self, name, account):
+        """
+        Time a stage of "selfreport" if a StageTimer is set.
+        :param name: name of the stage
+        :param account: account id
+        :return: context manager which yields a dict, in which "ok", "retries"
+        and "status" of the stage can be set
+        """
+        if self.stage_timer is None:
+            return nullcontext({})
+        return self.stage_timer.stage(name, account)
+
+    def __use_cassette(self, account):
+        """
+        Record or replay the requests of an account made within the context.
+        :param account: account id
+        :return: context manager
+        """
+        if self.cassette is None:
+            return nullcontext()
+        return self.cassette.use(account)
+
+    def __validate(self, url, person_info):
+        """
+        Log in with an account and get the page of "selfreport", which only
+        has a form when the login succeeded. These are the first requests of a
+        report, so a cassette recorded by a report can be replayed here.
+        :param url: url of the page
+        :param person_info: Personal information read from configuration file
+        :return: the result of the account, a dict of ValidationReport.FIELDS
+        """
+        result = {'id': person_info['id'], 'status': ValidationReport.OK, 'http_status': None, 'error': ''}
+        start = time.monotonic()
+        with self.__stage('validate', person_info['id']) as stage, self.__use_cassette(person_info['id']):
+            try:
+                with requests.Session() as sess:
+                    self.retry_policy.run(lambda: self.__login_requests(sess, person_info), stage)
+                    r = self.retry_policy.run(lambda: self.__request(sess, 'GET', url), stage)
+                result['http_status'] = stage['status'] = r.status_code
+                if self.view_state_extractor.extract(r.text) is None:
+                    result['status'] = ValidationReport.BAD_CREDENTIALS
+            except Exception as e:
+                response = getattr(e, 'response', None)
+                result.update(status=ValidationReport.classify(e), error=str(e),
+                              http_status=response.status_code if response is not None else None)
+            stage['ok'] = result['status'] == ValidationReport.OK
+        result.update(latency=round(time.monotonic() - start, 3), retries=stage.get('retries', 0))
+
+        if stage['ok']:
+            self.logger.info("验证 成功 {}".format(person_info['id']))
+        else:
+            self.logger.error("验证 失败 {} {}".format(person_info['id'], result['status']))
+        return result
+
+    def __login(self, sess, person_info, stage):
+        """
+        Log in to "selfreport" through newsso with user account and password.
+        :param sess: requests.Session
+        :param person_info: Personal information read from configuration file
+        :param stage: dict in which the result, retries and status are recorded
+        :return: whether the login requests were completed
+        """
+        try:
+            stage['status'] = self.retry_policy.run(lambda: self.__login_requests(sess, person_info),
+                                                    stage).status_code
+        except Exception:
+            self.logger.error("登录1 失败 {}".format(person_info['id']))
+            stage['ok'] = False
+            return False
+        return True
+
+    def __login_requests(self, sess, person_info):
+        """
+        Send the requests of the login once.
+        :param sess: requests.Session
+        :param person_info: Personal information read from configuration file
+        :return: the response of the authorization
+        """
+        server_config = self.setting_config.server
+        r = self.__request(sess, 'GET', server_config.default_url)
+        self.__request(sess, 'POST', r.url, data={
+            'username': person_info['id'],
+            'password': person_info['pwd']
+        })
+        return self.__request(sess, 'GET', server_config.authorize_url)
+
+    def __get_page(self, sess, url, stage):
+        """
+        Get the page of "selfreport".
+        :param sess: requests.Session
+        :param url: url of the page
+        :param stage: dict in which the result, retries and status are recorded
+        :return: the response, None if failed
+        """
+        try:
+            r = self.retry_policy.run(lambda: self.__request(sess, 'GET', url), stage)
+        except Exception:
+            self.logger.error("网页获取 失败 {}".format(url))
+            stage['ok'] = False
+            return None
+        stage['status'] = r.status_code
+        return r
+
+    def __submit(self, sess, url, stage, **kwargs):
+        """
+        Submit the report. Since a submit which reached the server must not be
+        sent twice, it is retried only if the connection could not be made or
+        the server answered with a server error.
+        :param sess: requests.Session
+        :param url: url of the page
+        :param stage: dict in which the result, retries and status are recorded
+        :param kwargs: the form and other arguments of requests.Session.request
+        :return: the response, None if failed
+        """
+        try:
+            r = self.retry_policy.run(lambda: self.__request(sess, 'POST', url, **kwargs), stage,
+                                      idempotent=False)
+        except Exception as e:
+            self.logger.error("提交 失败 {} {}".format(url, e))
+            return None
+        stage['status'] = r.status_code
+        return r
 
-        if '提交成功' in r.text:
+    def __request(self, sess, method, url, **kwargs):
+        """
+        Send a request once the circuit breaker and the rate limiter of its host
+        allow it. Server errors are raised as requests.HTTPError so that they
+        are retried.
+        :param sess: requests.Session
+        :param method: HTTP method
+        :param url: url
+        :param kwargs: other arguments of requests.Session.request
+        :return: the response
+        """
+        if self.cassette is not None and self.cassette.is_replay:
+            r = self.cassette.replay(method, url)
+        else:
+            host = urlsplit(url).hostname
+            self.circuit_breaker.wait(host)
+            self.rate_limiter.acquire(url)
+            kwargs.setdefault('timeout', self.setting_config.transport.timeout)
+            try:
+                r = sess.request(method, url, **kwargs)
+            except OSError as e:
+                self.circuit_breaker.record(host, False)
+                self.__record(method, url, kwargs, error=e)
+                raise
+            self.circuit_breaker.record(host, r.status_code < 500)
+            self.__record(method, url, kwargs, response=r)
+        if r.status_code >= 500:
+            raise requests.HTTPError("{} {}".format(r.status_code, url), response=r)
+        return r
+
+    async def __report_async(self, t, person_info, transport, job_key=None):
+        """
+        Coroutine of __report, which sends its requests through the shared
+        connection pool of "transport".
+        :param t: time
+        :param person_info: Personal information read from configuration file
+        :param transport: AsyncTransport
+        :param job_key: (day, slot) of the job in the job store, None if not tracked
+        :return: the status of "selfreport", None if the job was started by
+        another process
+        """
+        if not self.__start_job(job_key, person_info['id']):
+            return None
+        with self.__stage('report', person_info['id']) as stage, self.__use_cassette(person_info['id']):
+            async with transport.session() as sess:
+                stage['ok'] = await self.__submit_report_async(t, person_info, transport, sess)
+        return stage['ok']
+
+    async def __submit_report_async(self, t, person_info, transport, sess):
+        """
+        Coroutine of __submit_report.
+        :param t: time
+        :param person_info: Personal information read from configuration file
+        :param transport: AsyncTransport
+        :param sess: aiohttp.ClientSession of the account
+        :return: the status of "selfreport"
+        """
+        url = self.__get_report_url(t)
+        view_state = None
+
+        cookies = self.session_cache.get(person_info['id']) if self.session_cache is not None else None
+        if cookies is not None:
+            transport.set_cookies(sess, cookies)
+            with self.__stage('page', person_info['id']) as stage:
+                r = await self.__get_page_async(transport, sess, url, stage)
+            if r is None:
+                return False
+            with self.__stage('parse', person_info['id']) as stage:
+                view_state = self.view_state_extractor.extract(r.text)
+                stage['ok'] = view_state is not None
+            if view_state is None:
+                self.session_cache.remove(person_info['id'])
+                sess.cookie_jar.clear()
+
+        if view_state is None:
+            with self.__stage('login', person_info['id']) as stage:
+                is_logged_in = await self.__login_async(transport, sess, person_info, stage)
+            if not is_logged_in:
+                return False
+
+            with self.__stage('page', person_info['id']) as stage:
+                r = await self.__get_page_async(transport, sess, url, stage)
+            if r is None:
+                return False
+            with self.__stage('parse', person_info['id']) as stage:
+                view_state = self.view_state_extractor.extract(r.text)
+                stage['ok'] = view_state is not None
+
+            if view_state is None:
+                self.logger.error("登录2 失败 {}".format(person_info['id']))
+                return False
+
+            if self.session_cache is not None:
+                self.session_cache.put(person_info['id'], transport.get_cookies(sess))
+
+        with self.__stage('submit', person_info['id']) as stage:
+            r = await self.__submit_async(transport, sess, url, stage, data=self.__get_form(t, person_info, view_state),
+                                          headers=self.REPORT_HEADERS, allow_redirects=False)
+            stage['ok'] = r is not None and '提交成功' in r.text
+
+        if stage['ok']:
             self.logger.info("{} 成功 {}".format(self.__get_report_name(t), person_info['id']))
             return True
         else:
             self.logger.info("{} 失败 {}".format(self.__get_report_name(t), person_info['id']))
             return False
 
+    async def __login_async(self, transport, sess, person_info, stage):
+        """
+        Coroutine of __login.
+        :param transport: AsyncTransport
+        :param sess: aiohttp.ClientSession of the account
+        :param person_info: Personal information read from configuration file
+        :param stage: dict in which the result, retries and status are recorded
+        :return: whether the login requests were completed
+        """
+        server_config = self.setting_config.server
+
+        async def login():
+            r = await self.__request_async(transport, sess, 'GET', server_config.default_url)
+            await self.__request_async(transport, sess, 'POST', r.url, data={
+                'username': person_info['id'],
+                'password': person_info['pwd']
+            })
+            return await self.__request_async(transport, sess, 'GET', server_config.authorize_url)
+
+        try:
+            stage['status'] = (await self.retry_policy.run_async(login, stage)).status_code
+        except Exception:
+            self.logger.error("登录1 失败 {}".format(person_info['id']))
+            stage['ok'] = False
+            return False
+        return True
+
+    async def __get_page_async(self, transport, sess, url, stage):
+        """
+        Coroutine of __get_page.
+        :param transport: AsyncTransport
+        :param sess: aiohttp.ClientSession of the account
+        :param url: url of the page
+        :param stage: dict in which the result, retries and status are recorded
+        :return: the response, None if failed
+        """
+        try:
+            r = await self.retry_policy.run_async(lambda: self.__request_async(transport, sess, 'GET', url), stage)
+        except Exception:
+            self.logger.error("网页获取 失败 {}".format(url))
+            stage['ok'] = False
+            return None
+        stage['status'] = r.status_code
+        return r
+
+    async def __submit_async(self, transport, sess, url, stage, **kwargs):
+        """
+        Coroutine of __submit.
+        :param transport: AsyncTransport
+        :param sess: aiohttp.ClientSession of the account
+        :param url: url of the page
+        :param stage: dict in which the result, retries and status are recorded
+        :param kwargs: the form and other arguments of aiohttp.ClientSession.request
+        :return: the response, None if failed
+        """
+        try:
+            r = await self.retry_policy.run_async(
+                lambda: self.__request_async(transport, sess, 'POST', url, **kwargs), stage, idempotent=False)
+        except Exception as e:
+            self.logger.error("提交 失败 {} {}".format(url, e))
+            return None
+        stage['status'] = r.status_code
+        return r
+
+    async def __request_async(self, transport, sess, method, url, **kwargs):
+        """
+        Coroutine of __request, which waits for the circuit breaker and the rate
+        limiter without blocking the event loop.
+        :param transport: AsyncTransport
+        :param sess: aiohttp.ClientSession of the account
+        :param method: HTTP method
+        :param url: url
+        :param kwargs: other arguments of aiohttp.ClientSession.request
+        :return: AsyncResponse
+        """
+        if self.cassette is not None and self.cassette.is_replay:
+            r = self.cassette.replay(method, url)
+        else:
+            host = urlsplit(url).hostname
+            while True:
+                delay = self.circuit_breaker.check(host)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            delay = self.rate_limiter.reserve(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                r = await transport.request(sess, method, url, **kwargs)
+            except OSError as e:
+                self.circuit_breaker.record(host, False)
+                self.__record(method, url, kwargs, error=e)
+                raise
+            self.circuit_breaker.record(host, r.status_code < 500)
+            self.__record(method, url, kwargs, response=r)
+        if r.status_code >= 500:
+            raise HTTPError("{} {}".format(r.status_code, url), response=r)
+        return r
+
+    def __record(self, method, url, kwargs, response=None, error=None):
+        """
+        Record a request in the cassette, if recording.
+        :param method: HTTP method
+        :param url: url
+        :param kwargs: arguments of the request, of which only the form is kept
+        :param response: the response
+        :param error: the network error raised instead of a response
+        :return: no return
+        """
+        if self.cassette is not None:
+            self.cassette.record(method, url, kwargs.get('data'), response, error)
+
     def __send_report_email(self, is_successful, email_to, t):
         """
         Mail sending module, the content is the status of "selfreport".
@@ -328,52 +1125,40 @@ class SelfReport(object):
         :param t: time
         :return: no return
         """
-        if self.setting_config['report']['send_email']:
+        if self.setting_config.report.send_email:
             self.__send_mail(email_to, self.__get_subject(is_successful, t),
                              self.__get_report_message(is_successful, t))
 
-    def __send_mail(self, email_to, subject, message):
+    def __send_mail(self, email_to, subject, message, attachments=()):
         """
-        Basic module for sending emails.
+        Basic module for sending emails. The message is queued and sent in the
+        background through a reused SMTP connection.
         :param email_to: account to receive mail
         :param subject: subject of the email message
         :param message: message of the email
+        :param attachments: list of (file name, gzip compressed data)
         :return: no return
         """
-        msg = self.__get_email_msg([email_to], subject, message)
-
-        sender_config = self.setting_config['email']
+        msg = self.__get_email_msg([email_to], subject, message, attachments)
 
-        retry_time = 5
-        while True:
-            try:
-                server = smtplib.SMTP_SSL(
-                    sender_config['smtp'],
-                    port=sender_config['port'])
-                server.login(sender_config['username'], sender_config['password'])
-                server.send_message(msg)
-                server.close()
-                self.logger.info("发送邮件 成功 {}".format(email_to))
-            except smtplib.SMTPException:
-                if retry_time > 0:
-                    retry_time -= 1
-                    continue
-                self.logger.error("发送邮件 失败 {}".format(email_to))
-            break
+        self.mail_dispatcher.send(msg, email_to, self.setting_config.email)
 
-    def __get_email_msg(self, email_to, subject, message):
+    def __get_email_msg(self, email_to, subject, message, attachments=()):
         """
         Get email message.
         :param email_to: account to receive email
         :param subject: subject of the email message
         :param message: message of the email
+        :param attachments: list of (file name, gzip compressed data)
         :return: email message
         """
         msg = EmailMessage()
         msg['Subject'] = subject
-        msg['From'] = self.setting_config['email']['from']
+        msg['From'] = self.setting_config.email.sender
         msg['To'] = ', '.join(email_to)
         msg.set_content(message)
+        for file_name, data in attachments:
+            msg.add_attachment(data, maintype='application', subtype='gzip', filename=file_name)
         return msg
 
     def __get_subject(self, is_successful, t):
@@ -402,8 +1187,8 @@ class SelfReport(object):
         :param t: time
         :return: report name
         """
-        morning_hour = self.setting_config["report"]["morning_hour"]
-        night_hour = self.setting_config["report"]["night_hour"]
+        morning_hour = self.setting_config.report.morning_hour
+        night_hour = self.setting_config.report.night_hour
         return "每日两报（上午）" if morning_hour <= t.hour < night_hour else "每日两报（下午）"
 
     def __get_report_message(self, is_successful, t):
@@ -431,7 +1216,7 @@ class SelfReport(object):
         if not Path(file_path).exists():
             all_the_text = "无日志"
         else:
-            with open(file_path) as f:
+            with open(file_path, encoding='utf8', errors='replace') as f:
                 all_the_text = f.read()
 
         return all_the_text
@@ -0,0 +1,122 @@
+# -- coding: utf-8 --
+
+import os
+import json
+import time
+import threading
+
+
+class SessionCache(object):
+    def __init__(self, cache_path, max_age):
+        """
+        Initialize the class named SessionCache, which keeps the cookies of the
+        logged in sessions of every account on disk.
+        :param cache_path: path of the cache file
+        :param max_age: seconds after which a cached session is treated as expired
+        """
+        self.cache_path = cache_path
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.sessions = self.__read()
+
+    def load(self, account, sess):
+        """
+        Restore the cached cookies of "account" into "sess".
+        :param account: account id
+        :param sess: requests.Session
+        :return: whether a cached session which has not expired was restored
+        """
+        cookies = self.get(account)
+        if cookies is None:
+            return False
+        for c in cookies:
+            sess.cookies.set(c['name'], c['value'], domain=c['domain'], path=c['path'],
+                             expires=c['expires'], secure=c['secure'])
+        return True
+
+    def save(self, account, sess):
+        """
+        Cache the cookies of "sess" for "account".
+        :param account: account id
+        :param sess: requests.Session which has logged in
+        :return: no return
+        """
+        self.put(account, [{
+            'name': c.name,
+            'value': c.value,
+            'domain': c.domain,
+            'path': c.path,
+            'expires': c.expires,
+            'secure': c.secure
+        } for c in sess.cookies])
+
+    def get(self, account):
+        """
+        Get the cached cookies of "account", whatever the HTTP client.
+        :param account: account id
+        :return: list of dict of name, value, domain, path, expires and secure,
+        None if no cached session has not expired
+        """
+        with self.lock:
+            entry = self.sessions.get(account)
+            if entry is None:
+                return None
+            now = time.time()
+            if now - entry['saved'] > self.max_age or any(
+                    c['expires'] is not None and c['expires'] <= now for c in entry['cookies']):
+                del self.sessions[account]
+                self.dirty = True
+                return None
+            return entry['cookies']
+
+    def put(self, account, cookies):
+        """
+        Cache the cookies of "account", whatever the HTTP client.
+        :param account: account id
+        :param cookies: list of dict of name, value, domain, path, expires and secure
+        :return: no return
+        """
+        with self.lock:
+            self.sessions[account] = {'saved': time.time(), 'cookies': cookies}
+            self.dirty = True
+
+    def remove(self, account):
+        """
+        Forget the cached session of "account".
+        :param account: account id
+        :return: no return
+        """
+        with self.lock:
+            if self.sessions.pop(account, None) is not None:
+                self.dirty = True
+
+    def flush(self):
+        """
+        Write the cache to disk if it has been changed.
+        :return: no return
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            cache_dir = os.path.dirname(self.cache_path)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            tmp_path = self.cache_path + '.tmp'
+            with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf8') as f:
+                json.dump(self.sessions, f, separators=(',', ':'))
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
+
+    def __read(self):
+        """
+        Read the cache file.
+        :return: dict of account id -> cached session
+        """
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, encoding='utf8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,389 @@
+# -- coding: utf-8 --
+
+import os
+import threading
+from urllib.parse import quote
+from types import MappingProxyType
+from dataclasses import dataclass
+
+import yaml
+
+from selfreport.Roster import Loader
+
+
+@dataclass(frozen=True)
+class ReportConfig(object):
+    __slots__ = ('send_email', 'morning_hour', 'morning_minute', 'night_hour', 'night_minute', 'temperature',
+                 'view_state_parser')
+    send_email: bool
+    morning_hour: int
+    morning_minute: int
+    night_hour: int
+    night_minute: int
+    temperature: float
+    view_state_parser: str
+
+
+@dataclass(frozen=True)
+class ManagerConfig(object):
+    __slots__ = ('send_email', 'email_to', 'hour', 'minute', 'digest', 'max_failures', 'attach_log',
+                 'max_attachment_kb')
+    send_email: bool
+    email_to: str
+    hour: int
+    minute: int
+    digest: bool
+    max_failures: int
+    attach_log: bool
+    max_attachment_kb: int
+
+
+@dataclass(frozen=True)
+class ServerConfig(object):
+    __slots__ = ('selfreport_url', 'newsso_url', 'default_url', 'authorize_url')
+    selfreport_url: str
+    newsso_url: str
+    default_url: str
+    authorize_url: str
+
+
+@dataclass(frozen=True)
+class SchedulerConfig(object):
+    __slots__ = ('spread_minutes', 'catch_up_minutes', 'state_path', 'reload_interval')
+    spread_minutes: int
+    catch_up_minutes: int
+    state_path: str
+    reload_interval: int
+
+
+@dataclass(frozen=True)
+class JobStoreConfig(object):
+    __slots__ = ('enable', 'path', 'keep_days')
+    enable: bool
+    path: str
+    keep_days: int
+
+
+@dataclass(frozen=True)
+class ConcurrencyConfig(object):
+    __slots__ = ('workers', 'rate_limit')
+    workers: int
+    rate_limit: MappingProxyType
+
+
+@dataclass(frozen=True)
+class TransportConfig(object):
+    __slots__ = ('backend', 'max_in_flight', 'pool_size', 'timeout')
+    backend: str
+    max_in_flight: int
+    pool_size: int
+    timeout: float
+
+
+@dataclass(frozen=True)
+class ShardConfig(object):
+    __slots__ = ('lease_dir', 'lease_ttl')
+    lease_dir: str
+    lease_ttl: int
+
+
+@dataclass(frozen=True)
+class LogConfig(object):
+    __slots__ = ('flush_interval', 'compress')
+    flush_interval: float
+    compress: bool
+
+
+@dataclass(frozen=True)
+class RetryConfig(object):
+    __slots__ = ('max_retries', 'base_delay', 'max_delay', 'jitter', 'rules')
+    max_retries: int
+    base_delay: float
+    max_delay: float
+    jitter: float
+    rules: MappingProxyType
+
+
+@dataclass(frozen=True)
+class CircuitBreakerConfig(object):
+    __slots__ = ('window', 'failure_rate', 'min_requests', 'pause')
+    window: int
+    failure_rate: float
+    min_requests: int
+    pause: int
+
+
+@dataclass(frozen=True)
+class SessionCacheConfig(object):
+    __slots__ = ('enable', 'path', 'max_age')
+    enable: bool
+    path: str
+    max_age: int
+
+
+@dataclass(frozen=True)
+class MetricsConfig(object):
+    __slots__ = ('enable', 'json_log', 'host', 'port')
+    enable: bool
+    json_log: bool
+    host: str
+    port: int
+
+
+@dataclass(frozen=True)
+class EmailConfig(object):
+    __slots__ = ('sender', 'username', 'password', 'smtp', 'port', 'ssl', 'connections', 'idle_timeout')
+    sender: str
+    username: str
+    password: str
+    smtp: str
+    port: int
+    ssl: bool
+    connections: int
+    idle_timeout: int
+
+
+@dataclass(frozen=True)
+class SettingConfig(object):
+    __slots__ = ('report', 'manager', 'server', 'scheduler', 'job_store', 'concurrency', 'transport', 'shard', 'log',
+                 'retry', 'circuit_breaker', 'session_cache', 'metrics', 'email', 'schedule')
+    report: ReportConfig
+    manager: ManagerConfig
+    server: ServerConfig
+    scheduler: SchedulerConfig
+    job_store: JobStoreConfig
+    concurrency: ConcurrencyConfig
+    transport: TransportConfig
+    shard: ShardConfig
+    log: LogConfig
+    retry: RetryConfig
+    circuit_breaker: CircuitBreakerConfig
+    session_cache: SessionCacheConfig
+    metrics: MetricsConfig
+    email: EmailConfig
+    schedule: tuple
+
+    @classmethod
+    def load(cls, setting_config_path):
+        """
+        Load setting_config.yaml, and automatically correct errors after loading.
+        :param setting_config_path: path of setting_config.yaml
+        :return: SettingConfig
+        """
+        with open(setting_config_path, encoding='utf8') as f:
+            setting_config = yaml.load(f, Loader=Loader)
+        return cls.from_dict(setting_config)
+
+    @classmethod
+    def from_dict(cls, setting_config):
+        """
+        Validate the content of setting_config.yaml and build the config.
+        :param setting_config: dict read from setting_config.yaml, which is
+        corrected in place
+        :return: SettingConfig
+        """
+        report = setting_config['report']
+        email = setting_config['email']
+        if not email['from'] or not email['username'] or not email['password'] or not email['smtp'] or \
+                not email['port']:
+            report['send_email'] = False
+        email['ssl'] = email.get('ssl', True) is not False
+        if not isinstance(email.get('connections'), int) or email['connections'] < 1:
+            email['connections'] = 1
+        if not isinstance(email.get('idle_timeout'), int) or email['idle_timeout'] <= 0:
+            email['idle_timeout'] = 60
+
+        if report['morning_hour'] < 6 or report['morning_hour'] > 20:
+            report['morning_hour'] = 7
+        if report['morning_minute'] < 0 or report['morning_minute'] >= 60:
+            report['morning_minute'] = 30
+        if report['night_hour'] < 19 or report['night_hour'] > 23:
+            report['night_hour'] = 20
+        if report['night_minute'] < 0 or report['night_minute'] >= 60:
+            report['night_minute'] = 30
+
+        if report['temperature'] < 35 or report['temperature'] >= 37.3:
+            report['temperature'] = 36.5
+
+        if report.get('view_state_parser') not in ('regex', 'soup'):
+            report['view_state_parser'] = 'regex'
+
+        server = setting_config.get('server') or {}
+        server['selfreport_url'] = (server.get('selfreport_url') or 'https://selfreport.shu.edu.cn').rstrip('/')
+        server['newsso_url'] = (server.get('newsso_url') or 'https://newsso.shu.edu.cn').rstrip('/')
+
+        concurrency = setting_config.get('concurrency') or {}
+        if not isinstance(concurrency.get('workers'), int) or concurrency['workers'] < 1:
+            concurrency['workers'] = 1
+        concurrency['rate_limit'] = concurrency.get('rate_limit') or {}
+
+        transport = setting_config.get('transport') or {}
+        if transport.get('backend') not in ('requests', 'aiohttp'):
+            transport['backend'] = 'requests'
+        for key, default in (('max_in_flight', 200), ('pool_size', 100)):
+            if not isinstance(transport.get(key), int) or transport[key] < 1:
+                transport[key] = default
+        if not isinstance(transport.get('timeout'), (int, float)) or transport['timeout'] <= 0:
+            transport['timeout'] = 30
+
+        log = setting_config.get('log') or {}
+        if not isinstance(log.get('flush_interval'), (int, float)) or log['flush_interval'] < 0:
+            log['flush_interval'] = 1
+        log['compress'] = bool(log.get('compress', False))
+
+        shard = setting_config.get('shard') or {}
+        if not shard.get('lease_dir'):
+            shard['lease_dir'] = 'state/leases'
+        if not isinstance(shard.get('lease_ttl'), int) or shard['lease_ttl'] <= 0:
+            shard['lease_ttl'] = 600
+
+        job_store = setting_config.get('job_store') or {}
+        job_store['enable'] = bool(job_store.get('enable', False))
+        if not job_store.get('path'):
+            job_store['path'] = 'state/jobs.sqlite3'
+        if not isinstance(job_store.get('keep_days'), int) or job_store['keep_days'] <= 0:
+            job_store['keep_days'] = 7
+
+        session_cache = setting_config.get('session_cache') or {}
+        session_cache['enable'] = bool(session_cache.get('enable', False))
+        if not session_cache.get('path'):
+            session_cache['path'] = 'state/session_cache.json'
+        if not isinstance(session_cache.get('max_age'), int) or session_cache['max_age'] <= 0:
+            session_cache['max_age'] = 6 * 3600
+
+        retry = setting_config.get('retry') or {}
+        if not isinstance(retry.get('max_retries'), int) or retry['max_retries'] < 0:
+            retry['max_retries'] = 5
+        for key, default in (('base_delay', 1), ('max_delay', 30)):
+            if not isinstance(retry.get(key), (int, float)) or retry[key] < 0:
+                retry[key] = default
+        if not isinstance(retry.get('jitter'), (int, float)) or not 0 <= retry['jitter'] <= 1:
+            retry['jitter'] = 0.5
+        retry['rules'] = retry.get('rules') or {}
+
+        circuit_breaker = setting_config.get('circuit_breaker') or {}
+        for key, default in (('window', 20), ('min_requests', 10), ('pause', 60)):
+            if not isinstance(circuit_breaker.get(key), int) or circuit_breaker[key] <= 0:
+                circuit_breaker[key] = default
+        if not isinstance(circuit_breaker.get('failure_rate'), (int, float)) or \
+                not 0 < circuit_breaker['failure_rate'] <= 1:
+            circuit_breaker['failure_rate'] = 0.5
+
+        metrics = setting_config.get('metrics') or {}
+        metrics['enable'] = bool(metrics.get('enable', False))
+        metrics['json_log'] = metrics.get('json_log', True) is not False
+        metrics['host'] = metrics.get('host') or '127.0.0.1'
+        if not isinstance(metrics.get('port'), int) or not 0 <= metrics['port'] < 65536:
+            metrics['port'] = 0
+
+        scheduler = setting_config.get('scheduler') or {}
+        if not isinstance(scheduler.get('spread_minutes'), int) or scheduler['spread_minutes'] < 0:
+            scheduler['spread_minutes'] = 0
+        if not isinstance(scheduler.get('catch_up_minutes'), int) or scheduler['catch_up_minutes'] < 0:
+            scheduler['catch_up_minutes'] = 60
+        if not scheduler.get('state_path'):
+            scheduler['state_path'] = 'state/scheduler.json'
+        if not isinstance(scheduler.get('reload_interval'), int) or scheduler['reload_interval'] < 0:
+            scheduler['reload_interval'] = 10
+
+        manager = setting_config['manager']
+        if manager['send_email']:
+            if not manager['email_to']:
+                manager['send_email'] = False
+            if manager['hour'] < 0 or manager['hour'] > 23:
+                manager['hour'] = 22
+            if manager['minute'] < 0 or manager['minute'] >= 60:
+                manager['minute'] = 30
+        manager['digest'] = manager.get('digest', True) is not False
+        manager['attach_log'] = manager.get('attach_log', True) is not False
+        for key, default in (('max_failures', 100), ('max_attachment_kb', 5120)):
+            if not isinstance(manager.get(key), int) or manager[key] < 0:
+                manager[key] = default
+
+        redirect_uri = quote('{}/LoginSSO.aspx?ReturnUrl={}'.format(server['selfreport_url'],
+                                                                   quote('/Default.aspx', safe='')), safe='')
+        schedule = [('morning', report['morning_hour'], report['morning_minute']),
+                    ('night', report['night_hour'], report['night_minute'])]
+        if manager['send_email']:
+            schedule.append(('manager', manager['hour'], manager['minute']))
+
+        return cls(
+            report=ReportConfig(bool(report['send_email']), report['morning_hour'], report['morning_minute'],
+                                report['night_hour'], report['night_minute'], report['temperature'],
+                                report['view_state_parser']),
+            manager=ManagerConfig(bool(manager['send_email']), manager['email_to'], manager['hour'],
+                                  manager['minute'], manager['digest'], manager['max_failures'],
+                                  manager['attach_log'], manager['max_attachment_kb']),
+            server=ServerConfig(server['selfreport_url'], server['newsso_url'],
+                                server['selfreport_url'] + '/Default.aspx',
+                                '{}/oauth/authorize?response_type=code&client_id=WUHWfrntnWYHZfzQ5QvXUCVy'
+                                '&redirect_uri={}&scope=1'.format(server['newsso_url'], redirect_uri)),
+            scheduler=SchedulerConfig(scheduler['spread_minutes'], scheduler['catch_up_minutes'],
+                                      scheduler['state_path'], scheduler['reload_interval']),
+            job_store=JobStoreConfig(job_store['enable'], job_store['path'], job_store['keep_days']),
+            concurrency=ConcurrencyConfig(concurrency['workers'], MappingProxyType(dict(concurrency['rate_limit']))),
+            transport=TransportConfig(transport['backend'], transport['max_in_flight'], transport['pool_size'],
+                                      transport['timeout']),
+            shard=ShardConfig(shard['lease_dir'], shard['lease_ttl']),
+            log=LogConfig(log['flush_interval'], log['compress']),
+            retry=RetryConfig(retry['max_retries'], retry['base_delay'], retry['max_delay'], retry['jitter'],
+                              MappingProxyType(dict(retry['rules']))),
+            circuit_breaker=CircuitBreakerConfig(circuit_breaker['window'], circuit_breaker['failure_rate'],
+                                                 circuit_breaker['min_requests'], circuit_breaker['pause']),
+            session_cache=SessionCacheConfig(session_cache['enable'], session_cache['path'],
+                                             session_cache['max_age']),
+            metrics=MetricsConfig(metrics['enable'], metrics['json_log'], metrics['host'], metrics['port']),
+            email=EmailConfig(email['from'], email['username'], email['password'], email['smtp'], email['port'],
+                              email['ssl'], email['connections'], email['idle_timeout']),
+            schedule=tuple(schedule))
+
+
+class ConfigWatcher(object):
+    def __init__(self, config_path, interval, callback):
+        """
+        Initialize the class named ConfigWatcher, a thread which checks the
+        modification time and size of a file every "interval" seconds and
+        calls "callback" when they change.
+        :param config_path: path of the watched file
+        :param interval: seconds between two checks
+        :param callback: callable without parameters
+        """
+        self.config_path = config_path
+        self.interval = interval
+        self.callback = callback
+        self.signature = self.__get_signature()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Start watching in a background thread.
+        :return: no return
+        """
+        self.thread = threading.Thread(target=self.__run, name='config-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop watching.
+        :return: no return
+        """
+        self.stopped.set()
+
+    def __run(self):
+        while not self.stopped.wait(self.interval):
+            signature = self.__get_signature()
+            if signature is not None and signature != self.signature:
+                self.signature = signature
+                self.callback()
+
+    def __get_signature(self):
+        """
+        Get the modification time and size of the watched file.
+        :return: (mtime in ns, size), None if the file cannot be read
+        """
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
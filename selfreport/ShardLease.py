@@ -0,0 +1,259 @@
+# -- coding: utf-8 --
+
+import os
+import json
+import time
+import zlib
+import uuid
+import socket
+import threading
+from contextlib import contextmanager
+
+# tells this process apart from a process of another container with the same
+# host name and pid, renewed in a forked child
+_token = uuid.uuid4().hex[:12]
+
+
+def _renew_token():
+    global _token
+    _token = uuid.uuid4().hex[:12]
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_renew_token)
+
+
+class ShardLease(object):
+    def __init__(self, lease_dir, index, count, ttl=600, keep_days=7):
+        """
+        Initialize the class named ShardLease. The accounts are partitioned by
+        the hash of their id into "count" shards, and the shard "index" is
+        reported by whichever process holds its lease for the report. A lease
+        is a file created exclusively in a directory shared by all processes,
+        so a shard is reported by exactly one process even if it is started
+        twice, on one machine or on several.
+        :param lease_dir: directory of the lease files
+        :param index: index of this shard, from 0 to count - 1
+        :param count: number of shards
+        :param ttl: seconds after which an unfinished lease which has not been
+        renewed is taken as left by a dead process. A lease left by a dead
+        process of this machine is taken over at once
+        :param keep_days: days after which the lease files are deleted
+        """
+        if not 0 <= index < count:
+            raise ValueError("shard index {} is not within 0-{}".format(index, count - 1))
+        self.lease_dir = lease_dir
+        self.index = index
+        self.count = count
+        self.ttl = ttl
+        self.keep_days = keep_days
+        self.owner = "{}:{}:{}".format(socket.gethostname(), os.getpid(), _token)
+
+        if not os.path.exists(lease_dir):
+            os.makedirs(lease_dir, exist_ok=True)
+
+    @property
+    def name(self):
+        """
+        :return: name of this shard, e.g. 0of4
+        """
+        return "{}of{}".format(self.index, self.count)
+
+    def owns(self, account):
+        """
+        Check whether an account belongs to this shard.
+        :param account: account id
+        :return: whether this shard reports the account
+        """
+        return zlib.crc32(str(account).encode('utf-8')) % self.count == self.index
+
+    def acquire(self, day, slot, poll=None):
+        """
+        Take the lease of this shard for a report. A lease left unfinished by
+        a process which stopped renewing it, or which is no longer running on
+        this machine, is broken and taken over.
+        :param day: day of the report, e.g. 2020-11-26
+        :param slot: 1 for the morning report, 2 for the night report
+        :param poll: seconds between tries while another process holds the
+        lease, until it finishes the report or stops renewing the lease, None
+        to try only once
+        :return: whether the lease was taken, False if the report of this shard
+        has finished, or another process holds the lease and "poll" is None
+        """
+        self.__clean()
+        path = self.__get_path(day, slot)
+        while True:
+            for _ in range(2):
+                try:
+                    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                except FileExistsError:
+                    if not self.__break(path):
+                        break
+                    continue
+                with open(fd, 'w', encoding='utf8') as f:
+                    json.dump({'owner': self.owner, 'acquired': time.time(), 'finished': None}, f)
+                return True
+            if poll is None or self.is_finished(day, slot):
+                return False
+            time.sleep(poll)
+
+    def is_finished(self, day, slot):
+        """
+        Check whether the report of this shard has finished.
+        :param day: day of the report
+        :param slot: slot of the report
+        :return: whether a process has finished the report
+        """
+        lease = self.__read(self.__get_path(day, slot))
+        return lease is not None and bool(lease.get('finished'))
+
+    @contextmanager
+    def hold(self, day, slot):
+        """
+        Renew the lease in the background while the "with" block runs, so that
+        it is not taken over however long the accounts are spread.
+        :param day: day of the report
+        :param slot: slot of the report
+        :return: context manager
+        """
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.ttl / 3):
+                self.renew(day, slot)
+
+        thread = threading.Thread(target=renew, name='shard-lease', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def renew(self, day, slot):
+        """
+        Show that the report of this shard is still in progress.
+        :param day: day of the report
+        :param slot: slot of the report
+        :return: no return
+        """
+        try:
+            os.utime(self.__get_path(day, slot))
+        except OSError:
+            pass
+
+    def finish(self, day, slot):
+        """
+        Mark the report of this shard as finished, which keeps the lease so that
+        no process reports the shard again.
+        :param day: day of the report
+        :param slot: slot of the report
+        :return: no return
+        """
+        path = self.__get_path(day, slot)
+        lease = self.__read(path) or {}
+        lease.update({'owner': self.owner, 'finished': time.time()})
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            json.dump(lease, f)
+        os.replace(tmp_path, path)
+
+    def __break(self, path):
+        """
+        Remove a lease which is unfinished and has not been renewed within "ttl".
+        The lease is first renamed, which only one process can do, and put back
+        if it turns out to have been renewed meanwhile.
+        :param path: path of the lease file
+        :return: whether the lease was removed
+        """
+        lease = self.__read(path)
+        if not self.__is_stale(path, lease):
+            return False
+        broken_path = "{}.{}.broken".format(path, os.getpid())
+        try:
+            os.rename(path, broken_path)
+        except OSError:
+            return False
+        if not self.__is_stale(broken_path, self.__read(broken_path)):
+            try:
+                os.link(broken_path, path)
+            except OSError:
+                pass
+            os.remove(broken_path)
+            return False
+        os.remove(broken_path)
+        return True
+
+    def __is_stale(self, path, lease):
+        """
+        Check whether a lease has been left by a dead process.
+        :param path: path of the lease file
+        :param lease: content of the lease file, None if unreadable
+        :return: whether the lease may be broken
+        """
+        if lease is not None and lease.get('finished'):
+            return False
+        if lease is not None and self.__is_dead(lease.get('owner')):
+            return True
+        try:
+            return time.time() - os.path.getmtime(path) > self.ttl
+        except OSError:
+            return False
+
+    def __is_dead(self, owner):
+        """
+        Check whether the owner of a lease is this process, which left the
+        lease unfinished in an earlier try, or a process of this machine which
+        is no longer running. A process with the same host name and pid but
+        another token, e.g. of another container, is not taken as dead.
+        :param owner: "host:pid:token"
+        :return: whether the owner is known to hold the lease no more
+        """
+        if owner == self.owner:
+            return True
+        host, pid = (str(owner).split(':') + [''])[:2]
+        if host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    def __clean(self):
+        """
+        Delete the lease files older than "keep_days".
+        :return: no return
+        """
+        oldest = time.time() - self.keep_days * 86400
+        for file_name in os.listdir(self.lease_dir):
+            path = os.path.join(self.lease_dir, file_name)
+            try:
+                if os.path.getmtime(path) < oldest:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def __get_path(self, day, slot):
+        """
+        Get the path of the lease of this shard for a report.
+        :param day: day of the report
+        :param slot: slot of the report
+        :return: path
+        """
+        return os.path.join(self.lease_dir, "{}_{}_{}.lease".format(day, slot, self.name))
+
+    @staticmethod
+    def __read(path):
+        """
+        Read a lease file.
+        :param path: path of the lease file
+        :return: dict of owner, acquired and finished, None if unreadable
+        """
+        try:
+            with open(path, encoding='utf8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,78 @@
+# -- coding: utf-8 --
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class StageTimer(object):
+    def __init__(self, keep=None):
+        """
+        Initialize the class named StageTimer, which collects how long every
+        stage of "selfreport" takes.
+        :param keep: number of the latest durations kept for every stage, None
+        to keep all, 0 to keep none
+        """
+        self.lock = threading.Lock()
+        self.keep = keep
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, name, account):
+        """
+        Time the code in the "with" block as one run of a stage.
+        :param name: name of the stage
+        :param account: account id
+        :return: context manager which yields a dict, the code in the "with"
+        block may set "ok", "retries" and "status" in it
+        """
+        info = {}
+        start = time.perf_counter()
+        try:
+            yield info
+        except Exception:
+            info['ok'] = False
+            raise
+        finally:
+            self.observe(name, account, time.perf_counter() - start, **info)
+
+    def observe(self, name, account, seconds, ok=True, retries=0, status=None):
+        """
+        Record one run of a stage.
+        :param name: name of the stage
+        :param account: account id
+        :param seconds: duration
+        :param ok: whether the stage succeeded
+        :param retries: times the stage was retried
+        :param status: HTTP status code of the last response, if any
+        :return: no return
+        """
+        if self.keep == 0:
+            return
+        with self.lock:
+            durations = self.durations.get(name)
+            if durations is None:
+                durations = self.durations[name] = deque(maxlen=self.keep)
+            durations.append(seconds)
+
+    def summary(self):
+        """
+        Get the statistics of every stage.
+        :return: dict of stage name -> dict of count, total, mean, p50, p95 and
+        max in seconds, of the durations kept
+        """
+        with self.lock:
+            durations = {name: sorted(values) for name, values in self.durations.items()}
+
+        def percentile(values, p):
+            return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+        return {name: {
+            'count': len(values),
+            'total': sum(values),
+            'mean': sum(values) / len(values),
+            'p50': percentile(values, 0.5),
+            'p95': percentile(values, 0.95),
+            'max': values[-1]
+        } for name, values in durations.items()}
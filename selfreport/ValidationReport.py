@@ -0,0 +1,125 @@
+# -- coding: utf-8 --
+
+import os
+import csv
+import json
+import requests
+
+
+class ValidationReport(object):
+    OK = 'ok'
+    BAD_CREDENTIALS = 'bad_credentials'
+    TIMEOUT = 'timeout'
+    SERVER_ERROR = 'server_error'
+    NETWORK_ERROR = 'network_error'
+    ERROR = 'error'
+
+    STATUS_NAMES = {
+        OK: '成功',
+        BAD_CREDENTIALS: '账号或密码错误',
+        TIMEOUT: '超时',
+        SERVER_ERROR: '服务器错误',
+        NETWORK_ERROR: '网络错误',
+        ERROR: '其他错误'
+    }
+    FIELDS = ('id', 'status', 'http_status', 'latency', 'retries', 'error')
+
+    def __init__(self, t):
+        """
+        Initialize the class named ValidationReport, the results of checking
+        the login of every account. Each result is a dict of FIELDS: the account
+        id, one of the statuses above, the HTTP status code of the last
+        response, the seconds the check took, the times it was retried and the
+        error, if any.
+        :param t: time of the validation
+        """
+        self.time = t
+        self.results = []
+
+    def add(self, result):
+        """
+        Add the result of an account.
+        :param result: dict of FIELDS
+        :return: no return
+        """
+        self.results.append(result)
+
+    @property
+    def failures(self):
+        """
+        :return: the results of the accounts which failed
+        """
+        return [result for result in self.results if result['status'] != self.OK]
+
+    @classmethod
+    def classify(cls, error):
+        """
+        Get the status of an account from the error which ended its check.
+        :param error: the exception
+        :return: status
+        """
+        if isinstance(error, (requests.Timeout, TimeoutError)):
+            return cls.TIMEOUT
+        response = getattr(error, 'response', None)
+        if response is not None and response.status_code >= 500:
+            return cls.SERVER_ERROR
+        if isinstance(error, OSError):
+            return cls.NETWORK_ERROR
+        return cls.ERROR
+
+    def summary(self):
+        """
+        Get the number of accounts of every status and the latency percentiles.
+        :return: dict of total, counts (status -> number of accounts), and
+        p50, p95 and max latency in seconds
+        """
+        counts = {status: 0 for status in self.STATUS_NAMES}
+        for result in self.results:
+            counts[result['status']] += 1
+        latencies = sorted(result['latency'] for result in self.results)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))] if latencies else 0.0
+
+        return {
+            'total': len(self.results),
+            'counts': counts,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'max': latencies[-1] if latencies else 0.0
+        }
+
+    def render(self):
+        """
+        Render the summary and the failed accounts as text.
+        :return: text
+        """
+        summary = self.summary()
+        lines = ["验证{}个账号".format(summary['total']),
+                 '，'.join("{} {}".format(self.STATUS_NAMES[status], count)
+                          for status, count in summary['counts'].items() if count),
+                 "延迟 中位数{:.3f}秒 95%{:.3f}秒 最长{:.3f}秒".format(summary['p50'], summary['p95'], summary['max'])]
+        for result in sorted(self.failures, key=lambda r: r['status']):
+            lines.append("{} {} {}".format(result['id'], self.STATUS_NAMES[result['status']], result['error']).rstrip())
+        return '\n'.join(lines)
+
+    def save(self, path):
+        """
+        Save the results as CSV if "path" ends with .csv, otherwise as JSON
+        with the summary.
+        :param path: path of the report
+        :return: no return
+        """
+        report_dir = os.path.dirname(path)
+        if report_dir and not os.path.exists(report_dir):
+            os.makedirs(report_dir)
+        results = sorted(self.results, key=lambda r: r['id'])
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+                writer.writeheader()
+                writer.writerows(results)
+        else:
+            with open(path, 'w', encoding='utf8') as f:
+                json.dump({'time': self.time.isoformat(), 'summary': self.summary(), 'accounts': results}, f,
+                          ensure_ascii=False, indent=2)
@@ -0,0 +1,60 @@
+# -- coding: utf-8 --
+
+import re
+import html
+from bs4 import BeautifulSoup
+
+
+class ViewStateExtractor(object):
+    INPUT_PATTERN = re.compile(r'<input\b[^>]*?\bname\s*=\s*["\']__VIEWSTATE["\'][^>]*>', re.IGNORECASE)
+    VALUE_PATTERN = re.compile(r'\bvalue\s*=\s*(?:"([^"]*)"|\'([^\']*)\')', re.IGNORECASE)
+
+    def __init__(self, method='regex'):
+        """
+        Initialize the class named ViewStateExtractor.
+        :param method: "regex" scans the page for the first "__VIEWSTATE" input
+        and falls back to BeautifulSoup when it cannot be read, "soup" always
+        parses the whole page with BeautifulSoup
+        """
+        if method not in ('regex', 'soup'):
+            raise ValueError("unknown method {}".format(method))
+        self.method = method
+
+    def extract(self, text):
+        """
+        Find the value of "__VIEWSTATE" in the page.
+        :param text: html of the page
+        :return: the value of "__VIEWSTATE", None if not found
+        """
+        if self.method == 'regex':
+            value = self.extract_regex(text)
+            if value is not None or '__VIEWSTATE' not in text:
+                return value
+        return self.extract_soup(text)
+
+    @classmethod
+    def extract_regex(cls, text):
+        """
+        Fast path: stop at the first "__VIEWSTATE" input.
+        :param text: html of the page
+        :return: the value of "__VIEWSTATE", None if not found
+        """
+        tag = cls.INPUT_PATTERN.search(text)
+        if tag is None:
+            return None
+        value = cls.VALUE_PATTERN.search(tag.group(0))
+        if value is None:
+            return None
+        value = value.group(1) if value.group(1) is not None else value.group(2)
+        return html.unescape(value) if '&' in value else value
+
+    @staticmethod
+    def extract_soup(text):
+        """
+        Slow path: parse the whole page with BeautifulSoup.
+        :param text: html of the page
+        :return: the value of "__VIEWSTATE", None if not found
+        """
+        soup = BeautifulSoup(text, 'html.parser')
+        view_state = soup.find('input', attrs={'name': '__VIEWSTATE'})
+        return None if view_state is None else view_state.get('value')
@@ -0,0 +1,42 @@
+# -- coding: utf-8 --
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from selfreport.AsyncTransport import AsyncTransport
+
+URL = 'http://127.0.0.1/XueSFX/HalfdayReport.aspx'
+
+
+class Session(object):
+    def __init__(self, error):
+        self.error = error
+        self.kwargs = None
+
+    def request(self, method, url, **kwargs):
+        self.kwargs = kwargs
+        return self
+
+    async def __aenter__(self):
+        raise self.error
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+def test_timeout_is_raised_as_connection_error_with_its_name():
+    with pytest.raises(ConnectionError) as info:
+        asyncio.run(AsyncTransport.request(Session(asyncio.TimeoutError()), 'GET', URL))
+    assert str(info.value) == "{} TimeoutError".format(URL)
+
+
+def test_form_is_url_encoded():
+    sess = Session(asyncio.TimeoutError('timed out'))
+    with pytest.raises(ConnectionError) as info:
+        asyncio.run(AsyncTransport.request(sess, 'POST', URL, data={'F_STATE': 'a b', '__VIEWSTATE': '/w=='}))
+    assert str(info.value) == "{} timed out".format(URL)
+    assert sess.kwargs['data'] == 'F_STATE=a+b&__VIEWSTATE=%2Fw%3D%3D'
+    assert sess.kwargs['headers']['Content-Type'] == 'application/x-www-form-urlencoded'
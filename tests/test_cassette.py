@@ -0,0 +1,106 @@
+# -- coding: utf-8 --
+
+import gzip
+import json
+import asyncio
+import threading
+
+import pytest
+import requests
+
+from selfreport.Cassette import Cassette, CassetteError
+from selfreport.RetryPolicy import UnsentError
+
+SELFREPORT_URL = 'https://selfreport.shu.edu.cn/XueSFX/HalfdayReport.aspx?day=2026-10-17&t=1'
+LOGIN_URL = 'https://newsso.shu.edu.cn/login/abc'
+
+
+class Response(object):
+    def __init__(self, status_code, url, text):
+        self.status_code = status_code
+        self.url = url
+        self.text = text
+
+
+def record(cassette_dir, account='1'):
+    cassette = Cassette(Cassette.RECORD, str(cassette_dir))
+    with cassette.use(account):
+        cassette.record('POST', LOGIN_URL, data={'username': account, 'password': 'secret'},
+                        response=Response(200, 'https://selfreport.shu.edu.cn/Default.aspx', '<html>主页</html>'))
+        cassette.record('GET', SELFREPORT_URL, error=requests.ReadTimeout('read timed out'))
+        cassette.record('GET', SELFREPORT_URL, response=Response(200, SELFREPORT_URL, '<html>每日两报</html>'))
+        cassette.record('POST', SELFREPORT_URL, data={'F_STATE': b'eyJ9', '__VIEWSTATE': '/w=='},
+                        error=requests.ConnectTimeout('connect timed out'))
+        cassette.record('POST', SELFREPORT_URL, response=Response(200, SELFREPORT_URL, '提交成功'))
+    return cassette
+
+
+def test_recorded_requests_are_replayed_in_order(tmp_path):
+    record(tmp_path)
+    cassette = Cassette(Cassette.REPLAY, str(tmp_path))
+    with cassette.use('1'):
+        assert cassette.replay('POST', LOGIN_URL).text == '<html>主页</html>'
+        with pytest.raises(ConnectionError) as info:
+            cassette.replay('GET', SELFREPORT_URL)
+        assert not isinstance(info.value, UnsentError)
+        assert 'ReadTimeout: read timed out' in str(info.value)
+        # the query string, which holds the date, may differ
+        r = cassette.replay('GET', SELFREPORT_URL.replace('2026-10-17', '2026-10-18'))
+        assert (r.status_code, r.url, r.text) == (200, SELFREPORT_URL, '<html>每日两报</html>')
+        with pytest.raises(UnsentError):
+            cassette.replay('POST', SELFREPORT_URL)
+        assert cassette.replay('POST', SELFREPORT_URL).text == '提交成功'
+        with pytest.raises(CassetteError):
+            cassette.replay('GET', SELFREPORT_URL)
+
+
+def test_password_is_masked_and_bytes_are_decoded(tmp_path):
+    record(tmp_path)
+    with gzip.open(str(tmp_path / '1.jsonl.gz'), 'rt', encoding='utf8') as f:
+        exchanges = [json.loads(line) for line in f]
+    assert exchanges[0]['data'] == {'username': '1', 'password': '***'}
+    assert exchanges[3]['data'] == {'F_STATE': 'eyJ9', '__VIEWSTATE': '/w=='}
+    assert exchanges[3]['unsent'] and 'unsent' not in exchanges[1]
+
+
+def test_replay_of_another_request_is_refused(tmp_path):
+    record(tmp_path)
+    cassette = Cassette(Cassette.REPLAY, str(tmp_path))
+    with cassette.use('1'):
+        with pytest.raises(CassetteError):
+            cassette.replay('GET', LOGIN_URL)
+    with cassette.use('2'):
+        with pytest.raises(CassetteError):
+            cassette.replay('POST', LOGIN_URL)
+
+
+def test_accounts_are_recorded_apart_in_threads_and_coroutines(tmp_path):
+    cassette = Cassette(Cassette.RECORD, str(tmp_path))
+
+    def report(account):
+        with cassette.use(account):
+            cassette.record('GET', SELFREPORT_URL, response=Response(200, SELFREPORT_URL, account))
+
+    async def report_async(account):
+        await asyncio.sleep(0)
+        report(account)
+
+    async def report_all():
+        await asyncio.gather(*(report_async(str(account)) for account in range(3, 6)))
+
+    threads = [threading.Thread(target=report, args=(str(account),)) for account in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    asyncio.run(report_all())
+
+    replay = Cassette(Cassette.REPLAY, str(tmp_path))
+    for account in map(str, range(6)):
+        with replay.use(account):
+            assert replay.replay('GET', SELFREPORT_URL).text == account
+
+
+def test_unknown_mode_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        Cassette('rewind', str(tmp_path))
@@ -0,0 +1,51 @@
+# -- coding: utf-8 --
+
+import time
+
+from selfreport.CircuitBreaker import CircuitBreaker
+
+HOST = 'selfreport.shu.edu.cn'
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.record(HOST, False)
+
+
+def test_circuit_opens_when_failure_rate_is_reached():
+    breaker = CircuitBreaker(window=10, failure_rate=0.5, min_requests=4, pause=60)
+    fail(breaker, 3)
+    assert breaker.check(HOST) == 0
+    fail(breaker, 1)
+    assert breaker.check(HOST) > 0
+    assert breaker.check('newsso.shu.edu.cn') == 0
+
+
+def test_successful_probe_closes_the_circuit():
+    breaker = CircuitBreaker(window=10, failure_rate=0.5, min_requests=2, pause=0.05)
+    fail(breaker, 2)
+    time.sleep(0.06)
+    assert breaker.check(HOST) <= 0
+    # only one probe is let through
+    assert breaker.check(HOST) > 0
+    breaker.record(HOST, True)
+    assert breaker.check(HOST) == 0
+    fail(breaker, 1)
+    assert breaker.check(HOST) == 0
+
+
+def test_failed_probe_opens_the_circuit_again():
+    breaker = CircuitBreaker(window=10, failure_rate=0.5, min_requests=2, pause=0.05)
+    fail(breaker, 2)
+    time.sleep(0.06)
+    assert breaker.check(HOST) <= 0
+    breaker.record(HOST, False)
+    assert breaker.check(HOST) > 0
+
+
+def test_wait_blocks_until_the_pause_is_over():
+    breaker = CircuitBreaker(window=10, failure_rate=0.5, min_requests=2, pause=0.1)
+    fail(breaker, 2)
+    start = time.monotonic()
+    breaker.wait(HOST)
+    assert time.monotonic() - start >= 0.09
@@ -0,0 +1,52 @@
+# -- coding: utf-8 --
+
+import os
+import json
+import base64
+
+from selfreport.FStateTemplate import FStateTemplate
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PATH = os.path.join(ROOT_DIR, 'selfreport', 'f_state.json')
+# the F_STATE formatted with "%" before it was built from f_state.json
+LEGACY_PATH = os.path.join(ROOT_DIR, 'tests', 'fixtures', 'f_state_legacy.txt')
+
+ACCOUNTS = [
+    {'date': '2020-11-26', 'temperature': '36.5', 'campus': '宝山', 'county': '宝山区',
+     'address': '上海市宝山区上大路99号', 'title': '每日两报（上午）'},
+    {'date': '2020-11-27', 'temperature': '36.7', 'campus': '嘉定', 'county': '嘉定区',
+     'address': '上海市嘉定区城中路20号', 'title': '每日两报（下午）'},
+]
+
+
+def legacy_f_state(values):
+    with open(LEGACY_PATH, encoding='utf8') as f:
+        template = f.read()
+    f_state = template % (values['date'], values['temperature'], values['campus'], '上海', '上海市',
+                          values['county'], values['address'], values['title'])
+    return base64.b64encode(bytes(f_state, encoding='utf-8'))
+
+
+def render(template, values):
+    values = dict(values)
+    return template.render({'title': values.pop('title')}, **values)
+
+
+def test_render_matches_legacy_f_state():
+    template = FStateTemplate(TEMPLATE_PATH)
+    for values in ACCOUNTS:
+        assert render(template, values) == legacy_f_state(values)
+
+
+def test_cached_fixed_fields_do_not_leak_between_reports():
+    template = FStateTemplate(TEMPLATE_PATH)
+    for values in ACCOUNTS + ACCOUNTS:
+        assert render(template, values) == legacy_f_state(values)
+
+
+def test_fields_are_escaped_inside_json():
+    template = FStateTemplate(TEMPLATE_PATH)
+    values = dict(ACCOUNTS[0], address='5号楼"东"\\门')
+    f_state = json.loads(base64.b64decode(render(template, values)).decode('utf-8'))
+    assert f_state['p1_XiangXDZ']['Text'] == '5号楼"东"\\门'
+    assert f_state['p1_TiWen']['Text'] == '36.5'
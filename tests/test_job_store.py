@@ -0,0 +1,88 @@
+# -- coding: utf-8 --
+
+import sqlite3
+
+from selfreport.JobStore import JobStore
+
+DAY = '2026-10-17'
+
+
+def test_claimed_jobs_stay_pending_until_started(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    assert store.claim(DAY, 1, ['1', '2', '3']) == {'1', '2', '3'}
+    assert store.count(DAY, 1) == {JobStore.PENDING: 3}
+
+    assert store.start(DAY, 1, '1')
+    # a job is started only once
+    assert not store.start(DAY, 1, '1')
+    assert store.count(DAY, 1) == {JobStore.PENDING: 2, JobStore.IN_FLIGHT: 1}
+
+
+def test_only_unfinished_jobs_are_claimed_again(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    store.claim(DAY, 1, ['1', '2', '3'])
+    for account in ('1', '2'):
+        store.start(DAY, 1, account)
+    store.finish(DAY, 1, '1', True)
+    store.finish(DAY, 1, '2', False)
+
+    assert store.claim(DAY, 1, ['1', '2', '3', '4']) == {'2', '3', '4'}
+    assert store.count(DAY, 1) == {JobStore.DONE: 1, JobStore.FAILED: 1, JobStore.PENDING: 2}
+
+
+def test_jobs_in_flight_of_this_process_are_claimed_again(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    store = JobStore(db_path)
+    other = JobStore(db_path)
+    store.claim(DAY, 1, ['1', '2'])
+    # the report of "1" raised before it finished, "2" is reported by another process
+    store.start(DAY, 1, '1')
+    other.start(DAY, 1, '2')
+
+    assert store.claim(DAY, 1, ['1', '2']) == {'1'}
+    assert store.count(DAY, 1, ['1', '2']) == {JobStore.PENDING: 1, JobStore.IN_FLIGHT: 1}
+
+
+def test_count_of_accounts(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    store.claim(DAY, 1, ['1', '2', '3'])
+    store.start(DAY, 1, '1')
+    store.finish(DAY, 1, '1', True)
+    assert store.count(DAY, 1, ['1', '2', '5']) == {JobStore.DONE: 1, JobStore.PENDING: 1}
+
+
+def test_slots_are_separate(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    store.claim(DAY, 1, ['1'])
+    store.start(DAY, 1, '1')
+    store.finish(DAY, 1, '1', True)
+    assert store.claim(DAY, 2, ['1']) == {'1'}
+
+
+def test_jobs_left_in_flight_are_recovered(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    store = JobStore(db_path)
+    store.claim(DAY, 1, ['1', '2'])
+    store.start(DAY, 1, '1')
+    store.start(DAY, 1, '2')
+    store.finish(DAY, 1, '1', True)
+
+    # a process which died while reporting "2"
+    restarted = JobStore(db_path)
+    assert restarted.recovered == 1
+    assert restarted.claim(DAY, 1, ['1', '2']) == {'2'}
+
+
+def test_table_without_owner_is_upgraded(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite3')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE jobs (day TEXT NOT NULL, slot INTEGER NOT NULL, account TEXT NOT NULL, '
+                 'state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL, '
+                 'PRIMARY KEY (day, slot, account))')
+    conn.execute("INSERT INTO jobs VALUES (?, 1, '1', 'done', 1, 0)", (DAY,))
+    conn.commit()
+    conn.close()
+
+    store = JobStore(db_path)
+    assert store.claim(DAY, 1, ['1', '2']) == {'2'}
+    assert store.start(DAY, 1, '2')
@@ -0,0 +1,63 @@
+# -- coding: utf-8 --
+
+import gzip
+
+from selfreport.LogDigest import LogDigest
+
+LOG = '''INFO 2026-10-17 07:00:01,101 每日两报（上午） 成功 1
+ERROR 2026-10-17 07:00:02,202 登录2 失败 3
+INFO 2026-10-17 07:00:02,203 每日两报（上午） 失败 3
+ERROR 2026-10-17 07:00:03,303 报送 异常 4 timed out
+Traceback (most recent call last):
+  File "SelfReport.py", line 1, in __report
+INFO 2026-10-17 07:00:04,404 发送邮件 成功 a@b
+WARNING 2026-10-17 07:00:05,505 分片0of2 已由其他进程报送
+INFO 2026-10-17 20:00:01,101 每日两报（下午） 成功 1
+'''
+
+
+def write_log(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf8')
+    return str(path)
+
+
+def test_lines_are_counted_by_level_and_result(tmp_path):
+    digest = LogDigest()
+    digest.add_file(write_log(tmp_path, 'log', LOG))
+    assert digest.lines == 9
+    assert digest.levels == {'INFO': 4, 'ERROR': 2, 'WARNING': 1}
+    assert digest.results == {('每日两报（上午）', '成功'): 1, ('登录2', '失败'): 1, ('每日两报（上午）', '失败'): 1,
+                              ('报送', '异常'): 1, ('发送邮件', '成功'): 1, ('每日两报（下午）', '成功'): 1}
+    assert digest.failure_count == 3
+    assert digest.failures == ['07:00:02 登录2 失败 3', '07:00:02 每日两报（上午） 失败 3',
+                               '07:00:03 报送 异常 4 timed out']
+
+
+def test_only_the_first_failures_are_listed(tmp_path):
+    digest = LogDigest(max_failures=2)
+    for label in ('0of2', '1of2'):
+        digest.add_file(write_log(tmp_path, label, LOG), label)
+    digest.add_file(str(tmp_path / 'missing'), '2of2')
+
+    assert digest.failure_count == 6
+    assert digest.failures == ['07:00:02 [0of2] 登录2 失败 3',
+                               '07:00:02 [0of2] 每日两报（上午） 失败 3']
+    text = digest.render('10月17日 日志')
+    assert '日志共18行' in text
+    assert 'INFO 8，WARNING 2，ERROR 4' in text
+    assert '无日志：2of2' in text
+    assert '每日两报（上午） 成功 2 失败 2' in text
+    assert '失败记录（前2条，共6条）：' in text
+
+
+def test_empty_log(tmp_path):
+    text = LogDigest().render('10月17日 日志')
+    assert text.endswith('各阶段结果：\n无\n\n失败记录（共0条）：\n无')
+
+
+def test_compressed_log_is_limited_in_size(tmp_path):
+    path = write_log(tmp_path, 'log', LOG * 100)
+    assert gzip.decompress(LogDigest.compress(path, 10 ** 6)).decode('utf8') == LOG * 100
+    assert LogDigest.compress(path, 10) is None
+    assert LogDigest.compress(str(tmp_path / 'missing'), 10 ** 6) is None
@@ -0,0 +1,27 @@
+# -- coding: utf-8 --
+
+from selfreport.Metrics import Metrics
+from selfreport.StageTimer import StageTimer
+
+
+def test_stage_timer_keeps_only_the_latest_durations():
+    stage_timer = StageTimer(keep=3)
+    for seconds in range(10):
+        stage_timer.observe('report', 1, float(seconds))
+    summary = stage_timer.summary()['report']
+    assert summary['count'] == 3
+    assert summary['max'] == 9.0
+    assert summary['p50'] == 8.0
+
+
+def test_metrics_count_runs_without_keeping_durations():
+    metrics = Metrics()
+    for seconds in range(1000):
+        metrics.observe('report', seconds, 0.02, ok=seconds % 10 != 0, retries=1, status=200)
+    assert metrics.durations == {}
+    assert metrics.results == {('report', 'ok'): 900, ('report', 'fail'): 100}
+    text = metrics.render()
+    assert 'selfreport_stage_duration_seconds_count{stage="report"} 1000' in text
+    assert 'selfreport_stage_duration_seconds_bucket{stage="report",le="0.01"} 0' in text
+    assert 'selfreport_stage_duration_seconds_bucket{stage="report",le="0.025"} 1000' in text
+    assert 'selfreport_stage_retries_total{stage="report"} 1000' in text
@@ -0,0 +1,81 @@
+# -- coding: utf-8 --
+
+import socket
+import smtplib
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from selfreport.RetryPolicy import RetryPolicy, UnsentError
+
+
+class Response(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def refused():
+    reason = NewConnectionError(None, 'Connection refused')
+    return requests.ConnectionError(MaxRetryError(None, '/', reason))
+
+
+def server_error(status_code=503):
+    return requests.HTTPError("{} /".format(status_code), response=Response(status_code))
+
+
+def test_network_errors_are_retried_up_to_max_retries():
+    policy = RetryPolicy(max_retries=3)
+    assert policy.get_retries(requests.ConnectionError()) == 3
+    assert policy.get_retries(socket.timeout()) == 3
+    assert policy.get_retries(smtplib.SMTPServerDisconnected()) == 3
+
+
+def test_other_errors_are_not_retried():
+    policy = RetryPolicy(max_retries=3)
+    assert policy.get_retries(ValueError()) == 0
+    assert policy.get_retries(KeyError()) == 0
+
+
+def test_rules_apply_to_subclasses():
+    policy = RetryPolicy(max_retries=3, rules={'Timeout': 1, 'HTTPError': 2, 'ValueError': 4})
+    assert policy.get_retries(requests.ReadTimeout()) == 1
+    assert policy.get_retries(requests.ConnectTimeout()) == 1
+    assert policy.get_retries(server_error()) == 2
+    assert policy.get_retries(UnicodeDecodeError('utf8', b'', 0, 1, '')) == 4
+    assert policy.get_retries(requests.ConnectionError()) == 3
+
+
+def test_delay_grows_up_to_max_delay():
+    policy = RetryPolicy(base_delay=1, max_delay=5, jitter=0)
+    assert [policy.get_delay(attempt) for attempt in range(5)] == [1, 2, 4, 5, 5]
+
+
+@pytest.mark.parametrize('error, unsent', [
+    (refused(), True),
+    (requests.ConnectTimeout(), True),
+    (UnsentError(), True),
+    (server_error(502), True),
+    (server_error(404), False),
+    (requests.ReadTimeout(), False),
+    (requests.ConnectionError('Connection aborted.'), False),
+    (ConnectionError(), False),
+])
+def test_unsent_errors(error, unsent):
+    assert RetryPolicy.is_unsent(error) == unsent
+
+
+def test_request_which_is_not_idempotent_is_not_sent_again():
+    policy = RetryPolicy(max_retries=3, base_delay=0, max_delay=0)
+    errors = [refused(), server_error(), requests.ReadTimeout()]
+    calls = []
+
+    def submit():
+        calls.append(1)
+        raise errors[len(calls) - 1]
+
+    stage = {}
+    with pytest.raises(requests.ReadTimeout):
+        policy.run(submit, stage, idempotent=False)
+    assert len(calls) == 3
+    assert stage['retries'] == 2
@@ -0,0 +1,50 @@
+# -- coding: utf-8 --
+
+import os
+
+import yaml
+
+from selfreport.Roster import Roster
+
+
+def write_roster(path, accounts, mtime):
+    with open(path, 'w', encoding='utf8') as f:
+        yaml.safe_dump([{'id': account, 'pwd': 'p', 'email_to': 'a@b', 'campus': '宝山', 'county': '宝山区',
+                         'address': '上大路99号'} for account in accounts], f, allow_unicode=True)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_accounts_are_read_as_items_and_attributes(tmp_path):
+    path = str(tmp_path / 'person_config.yaml')
+    write_roster(path, [16120001, '16120002'], 10 ** 18)
+    roster = Roster(path).reload()
+    assert [account.id for account in roster] == ['16120001', '16120002']
+    assert roster.get(16120001)['campus'] == '宝山'
+    assert roster.get('16120003') is None
+
+
+def test_unchanged_file_is_not_parsed_again(tmp_path, monkeypatch):
+    path = str(tmp_path / 'person_config.yaml')
+    write_roster(path, ['1', '2'], 10 ** 18)
+    roster = Roster(path).reload()
+    accounts = roster.accounts
+
+    loads = []
+    original_load = yaml.load
+    monkeypatch.setattr(yaml, 'load', lambda *args, **kwargs: loads.append(1) or original_load(*args, **kwargs))
+    assert roster.reload().accounts is accounts
+    assert loads == []
+
+
+def test_changed_file_is_parsed_again(tmp_path):
+    path = str(tmp_path / 'person_config.yaml')
+    write_roster(path, ['1', '2'], 10 ** 18)
+    roster = Roster(path).reload()
+
+    # same size, only the modification time tells the change
+    write_roster(path, ['3', '4'], 10 ** 18 + 1)
+    assert [account.id for account in roster.reload()] == ['3', '4']
+    assert roster.get('1') is None
+
+    write_roster(path, ['3', '4', '5'], 10 ** 18 + 1)
+    assert len(roster.reload()) == 3
@@ -0,0 +1,100 @@
+# -- coding: utf-8 --
+
+import datetime as dt
+
+from selfreport.Scheduler import Scheduler
+
+
+class Clock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += dt.timedelta(seconds=seconds)
+        return False
+
+
+def make_scheduler(tmp_path, clock, catch_up_minutes=30):
+    scheduler = Scheduler(clock, str(tmp_path / 'scheduler.json'), catch_up_minutes)
+    scheduler.wakeup.wait = clock.sleep
+    return scheduler
+
+
+def next_due(scheduler):
+    return scheduler.queue[0][0]
+
+
+def test_missed_run_is_made_up(tmp_path):
+    clock = Clock(dt.datetime(2026, 10, 17, 7, 10))
+    scheduler = make_scheduler(tmp_path, clock)
+    scheduler.add_daily_job('morning', 7, 0, lambda due: None)
+    assert next_due(scheduler) == dt.datetime(2026, 10, 17, 7, 0)
+
+
+def test_run_missed_for_too_long_is_skipped(tmp_path):
+    clock = Clock(dt.datetime(2026, 10, 17, 7, 40))
+    scheduler = make_scheduler(tmp_path, clock)
+    scheduler.add_daily_job('morning', 7, 0, lambda due: None)
+    assert next_due(scheduler) == dt.datetime(2026, 10, 18, 7, 0)
+
+
+def test_run_without_catch_up_is_skipped(tmp_path):
+    clock = Clock(dt.datetime(2026, 10, 17, 7, 10))
+    scheduler = make_scheduler(tmp_path, clock)
+    scheduler.add_daily_job('manager', 7, 0, lambda due: None, catch_up=False)
+    assert next_due(scheduler) == dt.datetime(2026, 10, 18, 7, 0)
+
+
+def test_finished_run_is_not_made_up_after_restart(tmp_path):
+    clock = Clock(dt.datetime(2026, 10, 17, 6, 59))
+    scheduler = make_scheduler(tmp_path, clock)
+    fired = []
+
+    def action(due):
+        fired.append(due)
+        scheduler.clear()
+
+    scheduler.add_daily_job('morning', 7, 0, action)
+    scheduler.run()
+    assert fired == [dt.datetime(2026, 10, 17, 7, 0)]
+
+    clock.now = dt.datetime(2026, 10, 17, 7, 5)
+    restarted = make_scheduler(tmp_path, clock)
+    restarted.add_daily_job('morning', 7, 0, action)
+    assert next_due(restarted) == dt.datetime(2026, 10, 18, 7, 0)
+
+
+def test_failed_job_is_rescheduled(tmp_path):
+    clock = Clock(dt.datetime(2026, 10, 17, 6, 59))
+    scheduler = make_scheduler(tmp_path, clock)
+    fired = []
+
+    def action(due):
+        fired.append(due)
+        if len(fired) == 1:
+            raise ValueError('broken roster')
+        scheduler.clear()
+
+    scheduler.add_daily_job('morning', 7, 0, action)
+    scheduler.run()
+    assert fired == [dt.datetime(2026, 10, 17, 7, 0), dt.datetime(2026, 10, 18, 7, 0)]
+
+
+def test_failed_run_is_made_up_after_restart(tmp_path):
+    clock = Clock(dt.datetime(2026, 10, 17, 6, 59))
+    scheduler = make_scheduler(tmp_path, clock)
+
+    def action(due):
+        scheduler.clear()
+        raise ValueError('broken roster')
+
+    scheduler.add_daily_job('morning', 7, 0, action)
+    scheduler.run()
+
+    clock.now = dt.datetime(2026, 10, 17, 7, 5)
+    restarted = make_scheduler(tmp_path, clock)
+    restarted.add_daily_job('morning', 7, 0, action)
+    assert next_due(restarted) == dt.datetime(2026, 10, 17, 7, 0)
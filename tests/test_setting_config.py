@@ -0,0 +1,93 @@
+# -- coding: utf-8 --
+
+import os
+import dataclasses
+
+import pytest
+
+from selfreport.SettingConfig import SettingConfig
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def minimal_config(**sections):
+    # only the sections of the first setting_config.yaml, which must still load
+    setting_config = {
+        'report': {'send_email': True, 'morning_hour': 7, 'morning_minute': 30, 'night_hour': 20,
+                   'night_minute': 30, 'temperature': 36.5},
+        'manager': {'send_email': False, 'email_to': '', 'hour': 22, 'minute': 30},
+        'email': {'from': 'a@b', 'username': 'a', 'password': 'p', 'smtp': 'smtp.b', 'port': 465}
+    }
+    for name, section in sections.items():
+        setting_config[name] = dict(setting_config.get(name, {}), **section)
+    return setting_config
+
+
+def test_missing_sections_get_defaults():
+    config = SettingConfig.from_dict(minimal_config())
+    assert config.report.view_state_parser == 'regex'
+    assert config.server.selfreport_url == 'https://selfreport.shu.edu.cn'
+    assert config.server.default_url == 'https://selfreport.shu.edu.cn/Default.aspx'
+    assert config.concurrency.workers == 1
+    assert dict(config.concurrency.rate_limit) == {}
+    assert (config.transport.backend, config.transport.max_in_flight, config.transport.pool_size,
+            config.transport.timeout) == ('requests', 200, 100, 30)
+    assert (config.job_store.enable, config.job_store.path, config.job_store.keep_days) == \
+        (False, 'state/jobs.sqlite3', 7)
+    assert (config.retry.max_retries, config.retry.base_delay, config.retry.max_delay, config.retry.jitter) == \
+        (5, 1, 30, 0.5)
+    assert (config.circuit_breaker.window, config.circuit_breaker.failure_rate,
+            config.circuit_breaker.min_requests, config.circuit_breaker.pause) == (20, 0.5, 10, 60)
+    assert (config.shard.lease_dir, config.shard.lease_ttl) == ('state/leases', 600)
+    assert (config.log.flush_interval, config.log.compress) == (1, False)
+    assert (config.session_cache.enable, config.session_cache.max_age) == (False, 6 * 3600)
+    assert (config.metrics.enable, config.metrics.json_log, config.metrics.host, config.metrics.port) == \
+        (False, True, '127.0.0.1', 0)
+    assert (config.scheduler.spread_minutes, config.scheduler.catch_up_minutes, config.scheduler.reload_interval) \
+        == (0, 60, 10)
+    assert (config.email.ssl, config.email.connections, config.email.idle_timeout) == (True, 1, 60)
+    assert (config.manager.digest, config.manager.attach_log, config.manager.max_failures,
+            config.manager.max_attachment_kb) == (True, True, 100, 5120)
+    assert config.schedule == (('morning', 7, 30), ('night', 20, 30))
+
+
+def test_invalid_values_are_corrected():
+    config = SettingConfig.from_dict(minimal_config(
+        report={'morning_hour': 3, 'night_minute': 60, 'temperature': 38, 'view_state_parser': 'lxml'},
+        transport={'backend': 'httpx', 'timeout': -1},
+        concurrency={'workers': 0},
+        retry={'max_retries': -1, 'jitter': 2},
+        circuit_breaker={'failure_rate': 0},
+        metrics={'port': 70000},
+        server={'selfreport_url': 'http://127.0.0.1:8000/'}))
+    assert (config.report.morning_hour, config.report.night_minute, config.report.temperature,
+            config.report.view_state_parser) == (7, 30, 36.5, 'regex')
+    assert (config.transport.backend, config.transport.timeout) == ('requests', 30)
+    assert config.concurrency.workers == 1
+    assert (config.retry.max_retries, config.retry.jitter) == (5, 0.5)
+    assert config.circuit_breaker.failure_rate == 0.5
+    assert config.metrics.port == 0
+    assert config.server.default_url == 'http://127.0.0.1:8000/Default.aspx'
+
+
+def test_email_is_disabled_without_a_sender():
+    config = SettingConfig.from_dict(minimal_config(email={'password': ''}))
+    assert not config.report.send_email
+
+
+def test_manager_email_is_scheduled():
+    config = SettingConfig.from_dict(minimal_config(manager={'send_email': True, 'email_to': 'm@b', 'hour': 24}))
+    assert config.schedule[-1] == ('manager', 22, 30)
+
+
+def test_config_is_frozen():
+    config = SettingConfig.from_dict(minimal_config(retry={'rules': {'ReadTimeout': 1}}))
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.retry.max_retries = 0
+    with pytest.raises(TypeError):
+        config.retry.rules['ReadTimeout'] = 2
+
+
+def test_shipped_config_loads():
+    config = SettingConfig.load(os.path.join(ROOT_DIR, 'configs', 'setting_config.yaml'))
+    assert config == SettingConfig.load(os.path.join(ROOT_DIR, 'configs', 'setting_config.yaml'))
@@ -0,0 +1,128 @@
+# -- coding: utf-8 --
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import subprocess
+
+import pytest
+
+from selfreport.ShardLease import ShardLease
+
+DAY = '2026-10-17'
+
+
+def write_lease(lease_dir, name, owner, finished=None, age=0):
+    path = os.path.join(lease_dir, "{}_1_{}.lease".format(DAY, name))
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump({'owner': owner, 'acquired': time.time() - age, 'finished': finished}, f)
+    if age:
+        os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_accounts_are_split_into_disjoint_shards():
+    shards = [ShardLease.__new__(ShardLease) for _ in range(3)]
+    for index, shard in enumerate(shards):
+        shard.index, shard.count = index, 3
+    for account in range(100):
+        assert sum(shard.owns(account) for shard in shards) == 1
+
+
+def test_index_out_of_range_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        ShardLease(str(tmp_path), 2, 2)
+
+
+def test_lease_is_exclusive(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2)
+    write_lease(str(tmp_path), lease.name, 'otherhost:1')
+    assert not lease.acquire(DAY, 1)
+
+
+def test_finished_lease_is_not_taken_over(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2, ttl=1)
+    write_lease(str(tmp_path), lease.name, 'otherhost:1', finished=time.time(), age=60)
+    assert not lease.acquire(DAY, 1, poll=0.01)
+
+
+def test_lease_of_dead_process_on_this_host_is_taken_over(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2)
+    write_lease(str(tmp_path), lease.name, "{}:{}:0123456789ab".format(socket.gethostname(), dead_pid()))
+    assert lease.acquire(DAY, 1)
+
+
+def test_lease_of_live_process_is_kept(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2)
+    write_lease(str(tmp_path), lease.name, "{}:{}:0123456789ab".format(socket.gethostname(), os.getppid()))
+    assert not lease.acquire(DAY, 1)
+
+
+def test_lease_of_process_with_same_pid_in_another_container_is_kept(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2)
+    write_lease(str(tmp_path), lease.name, "{}:{}:0123456789ab".format(socket.gethostname(), os.getpid()))
+    assert not lease.acquire(DAY, 1)
+
+
+def test_lease_of_older_version_is_taken_over_only_if_its_process_died(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2)
+    write_lease(str(tmp_path), lease.name, "{}:{}".format(socket.gethostname(), os.getppid()))
+    assert not lease.acquire(DAY, 1)
+    write_lease(str(tmp_path), lease.name, "{}:{}".format(socket.gethostname(), dead_pid()))
+    assert lease.acquire(DAY, 1)
+
+
+def test_lease_which_is_not_renewed_is_taken_over(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2, ttl=10)
+    write_lease(str(tmp_path), lease.name, 'otherhost:1', age=60)
+    assert lease.acquire(DAY, 1)
+
+
+def test_restarted_process_takes_over_its_own_lease(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2)
+    assert lease.acquire(DAY, 1)
+    # the report failed before finish, the next try of this process goes on
+    assert ShardLease(str(tmp_path), 0, 2).acquire(DAY, 1)
+
+
+def test_polling_waits_until_the_lease_is_finished(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2)
+    path = write_lease(str(tmp_path), lease.name, 'otherhost:1')
+
+    def finish():
+        time.sleep(0.2)
+        write_lease(str(tmp_path), lease.name, 'otherhost:1', finished=time.time())
+
+    thread = threading.Thread(target=finish)
+    thread.start()
+    assert not lease.acquire(DAY, 1, poll=0.05)
+    thread.join()
+    assert lease.is_finished(DAY, 1)
+    assert os.path.exists(path)
+
+
+def test_polling_takes_over_a_lease_which_stops_being_renewed(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2, ttl=0.3)
+    write_lease(str(tmp_path), lease.name, 'otherhost:1')
+    assert lease.acquire(DAY, 1, poll=0.05)
+
+
+def test_held_lease_is_renewed(tmp_path):
+    lease = ShardLease(str(tmp_path), 0, 2, ttl=0.3)
+    # as if held by another live process, since this process may take over its own lease
+    lease.owner = "{}:{}:0123456789ab".format(socket.gethostname(), os.getppid())
+    assert lease.acquire(DAY, 1)
+    with lease.hold(DAY, 1):
+        time.sleep(0.6)
+        assert not ShardLease(str(tmp_path), 0, 2, ttl=0.3).acquire(DAY, 1)
+    lease.finish(DAY, 1)
+    assert lease.is_finished(DAY, 1)
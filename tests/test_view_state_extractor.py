@@ -0,0 +1,49 @@
+# -- coding: utf-8 --
+
+import os
+
+import pytest
+
+from selfreport.ViewStateExtractor import ViewStateExtractor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding='utf8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('fixture', ['HalfdayReport.html', 'Login.html'])
+def test_regex_agrees_with_soup_on_saved_pages(fixture):
+    text = read_fixture(fixture)
+    expected = ViewStateExtractor.extract_soup(text)
+    assert ViewStateExtractor.extract_regex(text) == expected
+    assert ViewStateExtractor('regex').extract(text) == expected
+    assert ViewStateExtractor('soup').extract(text) == expected
+
+
+def test_report_page_has_a_view_state():
+    assert ViewStateExtractor('regex').extract(read_fixture('HalfdayReport.html'))
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('<input type="hidden" name="__VIEWSTATE" value="abc"/>', 'abc'),
+    ("<INPUT value='a&amp;b' name='__VIEWSTATE'>", 'a&b'),
+    ('<input name="__VIEWSTATEGENERATOR" value="x"/><input name="__VIEWSTATE" value="y"/>', 'y'),
+    ('<html><body>用户名或密码错误</body></html>', None),
+])
+def test_regex_agrees_with_soup(text, expected):
+    assert ViewStateExtractor.extract_soup(text) == expected
+    assert ViewStateExtractor('regex').extract(text) == expected
+
+
+def test_unreadable_tag_falls_back_to_soup():
+    text = '<input name="__VIEWSTATE" data-x=">" value="z"/>'
+    assert ViewStateExtractor('regex').extract(text) == ViewStateExtractor.extract_soup(text)
+
+
+def test_unknown_method_is_refused():
+    with pytest.raises(ValueError):
+        ViewStateExtractor('lxml')